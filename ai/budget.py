@@ -0,0 +1,141 @@
+"""
+Module for holding the Budget class.
+"""
+
+from time import perf_counter, process_time
+
+
+class Budget:
+    """
+    This class says how much computation a search is allowed to spend.
+
+    Any combination of limits can be given: a number of iterations,
+    seconds of wall-clock time, seconds of CPU time and a number of
+    Nodes in the tree. The search stops as soon as any one of them runs
+    out. Limits that are left as None are not checked.
+
+    The clocks are only read once every check_every iterations, so a
+    time limit may be overrun by up to that many iterations. They aren't
+    read before the first iteration, so a search always does at least
+    one, and has a move to give, however tight its time limits are.
+
+    If, once the budget has run out, the child of the root with the best
+    value is not also the most visited one, the search may go on until
+    they agree, for up to max_extension times as much again of each
+    limit.
+
+    latency_cap is a wall-clock limit on the whole search, extension and
+    all, counted from when the search is asked for a move. Unlike the
+    other time limits it is checked after every iteration, so the search
+    finishes at most one iteration after that many seconds. It can be
+    the only limit given.
+    """
+    def __init__(self, max_iterations=None, max_wall_time=None,
+                 max_cpu_time=None, max_nodes=None, check_every=16,
+                 max_extension=0.5, latency_cap=None):
+        if max_iterations is None and max_wall_time is None and\
+                max_cpu_time is None and max_nodes is None and\
+                latency_cap is None:
+            raise ValueError("A Budget needs at least one limit")
+        if max_iterations is not None and max_iterations < 1:
+            raise ValueError("max_iterations must be at least 1")
+        if max_nodes is not None and max_nodes < 2:
+            # The root alone can't tell which move to make
+            raise ValueError("max_nodes must be at least 2")
+        if check_every < 1:
+            raise ValueError("check_every must be at least 1")
+        if max_extension < 0:
+            raise ValueError("max_extension can't be negative")
+        self.max_iterations = max_iterations
+        self.max_wall_time = max_wall_time
+        self.max_cpu_time = max_cpu_time
+        self.max_nodes = max_nodes
+        self.check_every = check_every
+        self.max_extension = max_extension
+        self.latency_cap = latency_cap
+        self._wall_start = None
+        self._cpu_start = None
+
+    def exhausted(self, num_iterations, num_nodes):
+        """
+        Returns True if a search that has run num_iterations iterations
+        since start() was called, and has num_nodes Nodes in its tree,
+        has used up this budget.
+        """
+        if self.max_iterations is not None and\
+                num_iterations >= self.max_iterations:
+            return True
+        if self.tree_is_full(num_nodes):
+            return True
+        if num_iterations == 0 or num_iterations % self.check_every != 0:
+            return False
+        return self._out_of_time()
+
+    def remaining_iterations(self, num_iterations):
+        """
+        Returns about how many more iterations a search that has run
+        num_iterations iterations since start() was called can do before
+        this budget runs out, or None if there is no telling. Time
+        limits are worked out from how fast the search has gone so far.
+        """
+        remaining = []
+        if self.max_iterations is not None:
+            remaining.append(self.max_iterations - num_iterations)
+        if num_iterations > 0:
+            for limit, spent in\
+                    ((self.max_wall_time, perf_counter() - self._wall_start),
+                     (self.max_cpu_time, process_time() - self._cpu_start)):
+                if limit is not None and spent > 0:
+                    remaining.append(num_iterations * (limit - spent) / spent)
+        if not remaining:
+            return None
+        return max(0, min(remaining))
+
+    def scaled(self, fraction):
+        """
+        Returns a new Budget with each of this one's iteration and time
+        limits multiplied by fraction, and with no extension of its own.
+        The Node limit is the same, since it limits the size of the tree
+        rather than how much work goes into it, and so is the latency
+        cap, since the search's deadline doesn't move.
+        """
+        max_iterations = None
+        if self.max_iterations is not None:
+            max_iterations = max(1, int(self.max_iterations * fraction))
+        wall_time = None
+        if self.max_wall_time is not None:
+            wall_time = self.max_wall_time * fraction
+        cpu_time = None
+        if self.max_cpu_time is not None:
+            cpu_time = self.max_cpu_time * fraction
+        return Budget(max_iterations=max_iterations, max_wall_time=wall_time,
+                      max_cpu_time=cpu_time, max_nodes=self.max_nodes,
+                      check_every=self.check_every, max_extension=0,
+                      latency_cap=self.latency_cap)
+
+    def start(self):
+        """
+        Starts the clocks. This should be called right before each
+        batch of iterations that this budget applies to.
+        """
+        self._wall_start = perf_counter()
+        self._cpu_start = process_time()
+
+    def tree_is_full(self, num_nodes):
+        """
+        Returns True if a tree of num_nodes Nodes is not allowed to grow
+        any more.
+        """
+        return self.max_nodes is not None and num_nodes >= self.max_nodes
+
+    def _out_of_time(self):
+        """
+        Returns True if either of the time limits has run out.
+        """
+        if self.max_wall_time is not None and\
+                perf_counter() - self._wall_start >= self.max_wall_time:
+            return True
+        if self.max_cpu_time is not None and\
+                process_time() - self._cpu_start >= self.max_cpu_time:
+            return True
+        return False
@@ -2,72 +2,200 @@
 Module for holding the Node class.
 """
 
-import copy
 import os
+import random
 
 class Node:
     """
-    This class is essentially just a GameState, but with some
+    This class is a position in the search tree, along with some
     helper functions and additional data (such as parent and children).
+
+    A Node does not hold a copy of its GameState. It only holds the move
+    that derived it from its parent, and the search plays moves on (and
+    takes them back from) a single scratch state as it walks the tree.
+    So every method that needs the game state takes the state that is
+    currently positioned at this Node.
+
+    If the search uses a transposition table, a Node can be the child of
+    more than one parent, through different moves. So each Node keeps
+    the moves to its children in child_moves, which lines up with
+    children, and move and parent are only those of the first parent
+    the Node was derived from.
+
+    A search can make millions of these, so they are kept as small as
+    possible: there is no __dict__, a Node with no children shares one
+    empty tuple rather than having its own list, and anything that can
+    be worked out from the tree (such as the name) is only worked out
+    when it is asked for.
+
+    total_reward is from the point of view of player, which is the index
+    of the player who took the move to this Node (so the one choosing
+    between it and its siblings). For the root, it is the player that
+    the search is for.
+
+    amaf_reward and amaf_visits are the all-moves-as-first statistics
+    used by RAVE: the total reward and the number of visits of every
+    playout through the parent in which the player took this Node's
+    move at any point, not just right away. They are only kept up to
+    date if the search uses RAVE.
+
+    The moves that haven't been tried yet are kept in untried_moves, in
+    the reverse of the order they will be tried in, so that expanding is
+    just popping the next one off. It stays None until the first time
+    the Node is expanded, since most Nodes never are. If the search uses
+    prior probabilities for the moves, priors maps each of this Node's
+    moves to its prior, and is None otherwise. They are kept here rather
+    than on the children since, with transpositions, a child's prior
+    depends on which parent it is reached from.
     """
-    def __init__(self, state):
-        self.name = None
-        self.state = state
+    __slots__ = ("move", "parent", "children", "child_moves",
+                 "untried_moves", "priors", "player", "total_reward",
+                 "num_times_visited", "amaf_reward", "amaf_visits",
+                 "virtual_loss")
+
+    def __init__(self, move=None, player=None):
+        self.move = move
+        self.player = player
         self.parent = None
-        self.children = []
+        self.children = ()
+        self.child_moves = ()
+        self.untried_moves = None
+        self.priors = None
         self.total_reward = 0
         self.num_times_visited = 0
-        self.already_tried_actions = []
+        self.amaf_reward = 0
+        self.amaf_visits = 0
+        self.virtual_loss = 0
 
     def __str__(self):
         s = "Node: "
-        for key, val in self.__dict__.items():
-            s += os.linesep + "    " + key + ": " + str(val)
+        s += os.linesep + "    name: " + self.name
+        for key in self.__slots__:
+            s += os.linesep + "    " + key + ": " + str(getattr(self, key))
         return s
 
-    def available_actions(self):
+    @property
+    def already_tried_actions(self):
+        """
+        The actions that have already been used to derive children.
+        """
+        return list(self.child_moves)
+
+    @property
+    def name(self):
+        """
+        A name for debugging, made up of the moves from the root to this
+        Node, such as "root_3_4".
+        """
+        moves = []
+        v = self
+        while v.parent is not None:
+            moves.append(str(v.move))
+            v = v.parent
+        moves.append("root")
+        return "_".join(reversed(moves))
+
+    def add_child(self, child_node, move):
+        """
+        Adds the given Node to this Node's children, as the child that
+        the given move derives.
+        """
+        if child_node.parent is None:
+            child_node.parent = self
+        if self.children:
+            self.children.append(child_node)
+            self.child_moves.append(move)
+        else:
+            self.children = [child_node]
+            self.child_moves = [move]
+
+    def available_actions(self, state):
         """
         Returns the set of available moves that could be applied to
         this Node's state.
         """
-        return self.state.possible_moves()
+        return state.possible_moves()
 
-    def derive_child(self, action):
+    def child_for(self, move):
+        """
+        Returns the child that the given move derives from this Node, or
+        None if that child hasn't been added yet.
+        """
+        for child, child_move in zip(self.children, self.child_moves):
+            if child_move == move:
+                return child
+        return None
+
+    def derive_child(self, state, action, table=None):
         """
         Derives a new Node from this one and the given action.
+        The action is taken on the given state, which is left positioned
+        at the new Node.
+        If a TranspositionTable is given and it already has a Node for
+        the position that the action leads to, that Node becomes the
+        child rather than a new one.
         """
-        child_state = copy.deepcopy(self.state)
-        child_state.take_turn(action)
-        child_node = Node(child_state)
-        child_node.parent = self
-        child_node.name = self.name + "_" + str(child_node.move_that_derived_this_node())
-        self.children.append(child_node)
-        self.already_tried_actions.append(action)
+        player = state.current_player()
+        state.take_turn(action)
+        child_node = None
+        if table is not None:
+            key = state.zobrist_hash()
+            child_node = table.get(key)
+        if child_node is None:
+            child_node = Node(action, player)
+            if table is not None:
+                table.put(key, child_node)
+        self.add_child(child_node, action)
         return child_node
 
     def move_that_derived_this_node(self):
         """
-        Returns the action that created this Node's game state.
+        Returns the action that created this Node's game state (from
+        the first parent it was derived from).
         """
-        return self.state._move_that_derived_this_state
+        return self.move
 
-    def is_non_terminal(self):
+    def is_non_terminal(self, state):
         """
         A Node is terminal if its state is at game over.
         So this returns True as long as that is not the case.
         """
-        return not self.state.game_over()
+        return not state.game_over()
 
-    def is_not_fully_expanded(self):
+    def is_not_fully_expanded(self, state):
         """
         Returns True unless all possible children have been added to this
         Node's children list.
         """
-        return len(self.available_actions()) != len(self.children)
-
-
-
-
-
-
+        if self.untried_moves is None:
+            return len(self.available_actions(state)) != len(self.children)
+        return len(self.untried_moves) != 0
 
+    def next_untried_action(self, state, move_ordering=None,
+                            prior_function=None):
+        """
+        Returns the next action to derive a child with, and takes it off
+        of the untried moves. The Node must not be fully expanded.
+        The first time this is called, the untried moves are shuffled,
+        and then put in order by move_ordering if it is given. It is
+        called as move_ordering(state, moves) and returns the moves with
+        the ones to try first at the front. If it sorts them stably, the
+        moves it ranks the same are still tried in a random order.
+        If prior_function is given, it is called as
+        prior_function(state, moves) and returns the prior probability
+        of each of the moves, which are kept in priors. Then the moves
+        with the highest priors are tried first, whatever move_ordering
+        says.
+        """
+        if self.untried_moves is None:
+            moves = [a for a in self.available_actions(state)
+                     if a not in self.child_moves]
+            random.shuffle(moves)
+            if move_ordering is not None:
+                moves = list(move_ordering(state, moves))
+            if prior_function is not None:
+                self.priors = dict(zip(moves, prior_function(state, moves)))
+                moves.sort(key=self.priors.__getitem__, reverse=True)
+            moves.reverse()
+            self.untried_moves = moves
+        return self.untried_moves.pop()
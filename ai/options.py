@@ -0,0 +1,194 @@
+"""
+Module for holding the SearchOptions class.
+"""
+
+import math
+import sys
+import warnings
+
+
+class SearchOptions:
+    """
+    This class holds the settings that change how a search is done, as
+    opposed to how much computation it may spend, which is what a Budget
+    is for.
+
+    reuse_tree: If True, a search carries on from the tree of the last
+                search in the same game, rather than starting over.
+    num_workers: The number of independent searches to run at once in
+                 a pool of worker processes. Their results are merged
+                 before choosing a move. 1 searches in this process.
+    num_threads: The number of threads that grow the tree of each search
+                 together. See uct._threaded_search_helper. This only
+                 speeds the search up if the threads can run at the same
+                 time: on a free-threaded build of Python, or with a
+                 rollout_backend that lets go of the GIL, such as a
+                 NumPy one. Otherwise a RuntimeWarning is given, since
+                 num_workers is what uses more cores.
+    virtual_loss: When num_threads > 1, how many lost visits a Node
+                  is charged with while a thread is rolling out below
+                  it. This keeps the threads from all piling down the
+                  same path. It must be at least 1.
+    rollouts_per_leaf: The number of rollouts to do from each leaf that
+                       the tree policy reaches. Their rewards are backed
+                       up together, as that many visits.
+    rollout_backend: If not None, a function that does the rollouts
+                     instead of _default_policy. It is called as
+                     rollout_backend(state, reward_function, num_rollouts)
+                     and returns the total reward of num_rollouts
+                     rollouts from state, leaving state unchanged.
+                     It can simulate them all at once, for example
+                     games.connect4.rollouts.batch_rollouts.
+    rollout_policy: If not None, a function that picks the moves of each
+                    rollout instead of picking them uniformly at random.
+                    It is called as rollout_policy(state, moves) and
+                    returns one of moves, which are the state's possible
+                    moves. For example,
+                    games.connect4.heuristics.win_then_block. It isn't
+                    used if there is a rollout_backend, which does its
+                    own choosing.
+    max_rollout_depth: If not None, the most moves a rollout plays
+                       before it stops and scores the state it got to
+                       with static_evaluator, rather than playing on
+                       to the end of the game. It has no effect on a
+                       rollout_backend.
+    static_evaluator: The function that scores the states where rollouts
+                      are cut off by max_rollout_depth. It is called as
+                      static_evaluator(state, reward_function) and
+                      returns an estimate, between 0 and 1, of the
+                      reward that reward_function would give the end of
+                      the game. For example,
+                      games.connect4.heuristics.count_threats.
+    transposition_table_size: If not None, positions that are reached by
+                              more than one order of moves share one
+                              Node, found through a TranspositionTable
+                              of up to this many entries. The game
+                              state needs a zobrist_hash() method.
+    move_ordering: If not None, a function that puts a Node's untried
+                   moves in the order they should be tried in. See
+                   Node.next_untried_action. For example,
+                   games.connect4.heuristics.center_first.
+    exploration: How much the tree policy favors children it knows
+                 less about over the ones that have done best so far,
+                 as the constant Cp of UCB1. The default of 1/sqrt(2)
+                 suits rewards between 0 and 1.
+    prior_function: If not None, a function that gives the prior
+                    probability of each move, which the tree policy then
+                    uses to choose with PUCT rather than UCB1. It is
+                    called as prior_function(state, moves) and returns
+                    the moves' priors, in the same order. The moves with
+                    the highest priors are expanded first. For example,
+                    games.connect4.heuristics.center_prior.
+    prior_exploration: The exploration constant of PUCT, used instead of
+                       exploration when there is a prior_function.
+    widening_children: If not None, a Node may only have this many
+                       children at first, with more allowed as it gets
+                       visited (progressive widening). This keeps the
+                       search on the first moves expanded, which are the
+                       best ones if there is a prior_function or
+                       move_ordering.
+    widening_exponent: With widening_children, a Node with N visits may
+                       have widening_children + N ** widening_exponent
+                       children.
+    rave_equivalence: If not None, the search uses RAVE: every playout
+                      also counts for the siblings along its path whose
+                      moves were taken later on in it (all moves as
+                      first), and the tree policy blends these AMAF
+                      rewards with the plain ones. This sets the blending
+                      schedule: the AMAF reward has half of the weight
+                      once a Node has about this many visits, and less
+                      after that. About 100 suits Connect 4. AMAF
+                      statistics are only gathered from rollouts that
+                      _default_policy does, not from a rollout_backend.
+                      It can't be used with more than one rollout per
+                      leaf, since the moves of each rollout would be
+                      credited with the rewards of all of them.
+    backup: Which player's reward each Node is given when backing up.
+            "negamax" gives it the reward of the player who chose it,
+            which is what should be used. "root_player" gives every Node
+            the reward of the player the search is for, as if the other
+            players were on their side. It is only there to compare
+            against, such as in bench.suite.bench_convergence.
+    solver: If not None, a function that is called as solver(state) and
+            returns who wins from state if both sides play perfectly
+            (the winner's symbol, or ' ' for a draw), or None if it
+            can't tell. The tree policy doesn't go below a Node it can
+            tell for, and instead of rolling out from one, the search
+            uses the reward for that winner. For example,
+            games.tictactoe.solver.solve. The game state needs a
+            reward_for_winner() method.
+    seed: If not None, the seed for the random number generator of each
+          search, so that searches with an iteration budget can be
+          reproduced exactly. Worker i is seeded with seed + i.
+    """
+    def __init__(self, reuse_tree=True, num_workers=1, num_threads=1,
+                 virtual_loss=1, rollouts_per_leaf=1, rollout_backend=None,
+                 rollout_policy=None, max_rollout_depth=None,
+                 static_evaluator=None, transposition_table_size=None,
+                 move_ordering=None, exploration=1 / math.sqrt(2),
+                 prior_function=None, prior_exploration=1.0,
+                 widening_children=None, widening_exponent=0.5,
+                 rave_equivalence=None, backup="negamax", solver=None,
+                 seed=None):
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        if num_threads < 1:
+            raise ValueError("num_threads must be at least 1")
+        if num_threads > 1 and rollout_backend is None and _gil_enabled():
+            warnings.warn("num_threads > 1 only adds overhead when Python "
+                          "has a GIL, unless the rollout_backend lets go "
+                          "of it; use num_workers to search on more cores",
+                          RuntimeWarning, stacklevel=2)
+        if virtual_loss < 1:
+            raise ValueError("virtual_loss must be at least 1")
+        if rollouts_per_leaf < 1:
+            raise ValueError("rollouts_per_leaf must be at least 1")
+        if max_rollout_depth is not None:
+            if max_rollout_depth < 0:
+                raise ValueError("max_rollout_depth can't be negative")
+            if static_evaluator is None:
+                raise ValueError("max_rollout_depth needs a "
+                                 "static_evaluator")
+        if exploration < 0 or prior_exploration < 0:
+            raise ValueError("The exploration constants can't be negative")
+        if backup not in ("negamax", "root_player"):
+            raise ValueError("backup must be \"negamax\" or "
+                             "\"root_player\"")
+        if widening_children is not None and widening_children < 1:
+            raise ValueError("widening_children must be at least 1")
+        if rave_equivalence is not None:
+            if rave_equivalence <= 0:
+                raise ValueError("rave_equivalence must be positive")
+            if rollouts_per_leaf != 1:
+                raise ValueError("rave_equivalence needs rollouts_per_leaf "
+                                 "to be 1")
+        self.reuse_tree = reuse_tree
+        self.num_workers = num_workers
+        self.num_threads = num_threads
+        self.virtual_loss = virtual_loss
+        self.rollouts_per_leaf = rollouts_per_leaf
+        self.rollout_backend = rollout_backend
+        self.rollout_policy = rollout_policy
+        self.max_rollout_depth = max_rollout_depth
+        self.static_evaluator = static_evaluator
+        self.transposition_table_size = transposition_table_size
+        self.move_ordering = move_ordering
+        self.exploration = exploration
+        self.prior_function = prior_function
+        self.prior_exploration = prior_exploration
+        self.widening_children = widening_children
+        self.widening_exponent = widening_exponent
+        self.rave_equivalence = rave_equivalence
+        self.backup = backup
+        self.solver = solver
+        self.seed = seed
+
+
+def _gil_enabled():
+    """
+    Returns True if this Python has a global interpreter lock, so only
+    one thread can run Python code at a time. Builds before 3.13 always
+    do.
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is None or is_gil_enabled()
@@ -0,0 +1,85 @@
+"""
+Module for running several independent searches from the same root at
+once, in a pool of worker processes (root parallelization).
+"""
+
+from ai.node import Node
+from ai.stats import SearchStats
+from concurrent.futures import ProcessPoolExecutor
+import random
+
+# The pool of worker processes, kept between searches since starting the
+# processes costs more than a short search does.
+_executor = None
+_executor_num_workers = None
+
+
+def search_in_parallel(game_state, reward_function, budget, options,
+                       stats=None):
+    """
+    Runs options.num_workers independent searches of game_state, each
+    with the whole budget, and returns a root Node whose children hold
+    the visit counts and rewards of all of them added together.
+    If a SearchStats is given, the workers' stats are merged into it.
+    """
+    collect_stats = stats is not None
+    executor = _get_executor(options.num_workers)
+    futures = []
+    for i in range(options.num_workers):
+        seed = None if options.seed is None else options.seed + i
+        futures.append(executor.submit(_search_worker, game_state,
+                                       reward_function, budget, options,
+                                       seed, collect_stats))
+
+    root = Node()
+    for future in futures:
+        children, worker_stats = future.result()
+        if worker_stats is not None:
+            stats.merge(worker_stats)
+        for move, num_times_visited, total_reward in children:
+            child = root.child_for(move)
+            if child is None:
+                child = Node(move)
+                root.add_child(child, move)
+            child.num_times_visited += num_times_visited
+            child.total_reward += total_reward
+            root.num_times_visited += num_times_visited
+    return root
+
+
+def _get_executor(num_workers):
+    """
+    Returns a pool of num_workers processes, starting it if need be.
+    """
+    global _executor
+    global _executor_num_workers
+    if _executor is None or _executor_num_workers != num_workers:
+        if _executor is not None:
+            _executor.shutdown()
+        _executor = ProcessPoolExecutor(max_workers=num_workers)
+        _executor_num_workers = num_workers
+    return _executor
+
+
+def _search_worker(game_state, reward_function, budget, options, seed,
+                   collect_stats=False):
+    """
+    Runs in a worker process. Searches game_state (which is the worker's
+    own unpickled copy) and returns a list of (move, num_times_visited,
+    total_reward) for each child of the root, along with the search's
+    SearchStats if collect_stats is True, or None if it isn't.
+    """
+    # The AI module might have been loaded from a path rather than as
+    # part of the ai package, so import it here by its package name,
+    # which any worker process can do.
+    from ai import uct
+
+    # Forked workers all start out with the same random state, so they
+    # have to be reseeded either way.
+    random.seed(seed)
+    stats = SearchStats() if collect_stats else None
+    root = uct._search_new_tree(game_state, reward_function, budget,
+                                options, stats)
+    children = [(move, c.num_times_visited, c.total_reward)
+                for c, move in zip(root.children, root.child_moves)]
+    return children, stats
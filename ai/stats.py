@@ -0,0 +1,125 @@
+"""
+Module for holding the SearchStats class.
+"""
+
+import json
+
+
+class SearchStats:
+    """
+    This class records what a search did, for when a SearchStats is
+    passed to get_best_move. When none is passed, nothing is recorded
+    and the search doesn't pay for any of it.
+
+    iterations: How many iterations the search did.
+    selection_seconds, expansion_seconds, rollout_seconds, backup_seconds:
+        How much time went to each part of the iterations. Backing up
+        includes taking the moves back off of the scratch state.
+    max_depth, average_depth: How deep the tree policy went, counting
+                              the root as depth 0.
+    nodes_allocated: How many new Nodes were added to the tree.
+    extensions: How many more times the search was run because the best
+                child of the root wasn't also the most visited one.
+    stop_reasons: Why each search stopped, one per search (so one per
+                  worker for a root-parallel search). See
+                  uct._stop_reason, along with "extension_budget" if an
+                  extension used up all it was allowed and "latency_cap"
+                  if the budget's latency cap was reached.
+    root_children: One dict per child of the root with its move, visits,
+                   total reward and mean value, filled in at the end.
+
+    If a callback is given, it is called with this object at the end of
+    each search, such as to log it or send it somewhere.
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.iterations = 0
+        self.selection_seconds = 0.0
+        self.expansion_seconds = 0.0
+        self.rollout_seconds = 0.0
+        self.backup_seconds = 0.0
+        self.max_depth = 0
+        self.total_depth = 0
+        self.nodes_allocated = 0
+        self.extensions = 0
+        self.stop_reasons = []
+        self.root_children = []
+
+    @property
+    def average_depth(self):
+        """
+        The average depth that the tree policy went to.
+        """
+        if self.iterations == 0:
+            return 0.0
+        return self.total_depth / self.iterations
+
+    def finish(self, root):
+        """
+        Records the children of the root, and calls the callback if
+        there is one. The search calls this when it is done.
+        """
+        self.root_children = []
+        for child, move in zip(root.children, root.child_moves):
+            visits = child.num_times_visited
+            value = child.total_reward / visits if visits else None
+            self.root_children.append({
+                "move": move,
+                "visits": visits,
+                "total_reward": child.total_reward,
+                "value": value,
+            })
+        if self.callback is not None:
+            self.callback(self)
+
+    def merge(self, other):
+        """
+        Adds the counts and times from another SearchStats into this one,
+        such as from a root-parallel worker's search.
+        """
+        self.iterations += other.iterations
+        self.selection_seconds += other.selection_seconds
+        self.expansion_seconds += other.expansion_seconds
+        self.rollout_seconds += other.rollout_seconds
+        self.backup_seconds += other.backup_seconds
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.total_depth += other.total_depth
+        self.nodes_allocated += other.nodes_allocated
+        self.extensions += other.extensions
+        self.stop_reasons.extend(other.stop_reasons)
+
+    def record_iteration(self, depth, added_node):
+        """
+        Records one iteration that reached the given depth, and that
+        added a new Node to the tree if added_node is True.
+        """
+        self.iterations += 1
+        self.total_depth += depth
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if added_node:
+            self.nodes_allocated += 1
+
+    def to_dict(self):
+        """
+        Returns everything recorded, as a dict.
+        """
+        return {
+            "iterations": self.iterations,
+            "selection_seconds": self.selection_seconds,
+            "expansion_seconds": self.expansion_seconds,
+            "rollout_seconds": self.rollout_seconds,
+            "backup_seconds": self.backup_seconds,
+            "max_depth": self.max_depth,
+            "average_depth": self.average_depth,
+            "nodes_allocated": self.nodes_allocated,
+            "extensions": self.extensions,
+            "stop_reasons": self.stop_reasons,
+            "root_children": self.root_children,
+        }
+
+    def to_json(self):
+        """
+        Returns everything recorded, as a JSON string.
+        """
+        return json.dumps(self.to_dict())
@@ -0,0 +1,66 @@
+"""
+Module for holding the TranspositionTable class.
+"""
+
+from collections import OrderedDict
+import itertools
+
+# When the table is full, the entry to replace is picked from this many
+# of the oldest entries
+_REPLACEMENT_CANDIDATES = 8
+
+
+class TranspositionTable:
+    """
+    This class maps the Zobrist hashes of positions to the Nodes for
+    them, so that a position reached by different orders of moves gets
+    one Node (and so one set of statistics) instead of one per order.
+    That turns the search tree into a DAG.
+
+    The table holds at most max_size entries. When it is full, the
+    least visited of the few oldest entries makes way for the new one.
+    Entries that are young or well visited are likely to be reached
+    again, and the rest aren't. A Node that is dropped from the table
+    stays in the tree; it just can't be found by transposition anymore.
+    """
+    def __init__(self, max_size):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self._nodes = OrderedDict()
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def get(self, key):
+        """
+        Returns the Node stored for the given hash, or None.
+        """
+        return self._nodes.get(key)
+
+    def put(self, key, node):
+        """
+        Stores node as the Node for the given hash.
+        """
+        if key not in self._nodes and len(self._nodes) >= self.max_size:
+            self._replace_one()
+        self._nodes[key] = node
+
+    def retain(self, nodes):
+        """
+        Drops every entry whose Node isn't in the given collection of
+        Nodes, such as when the rest of the tree is thrown away.
+        """
+        ids_to_keep = set(id(node) for node in nodes)
+        for key in [k for k, node in self._nodes.items()
+                    if id(node) not in ids_to_keep]:
+            del self._nodes[key]
+
+    def _replace_one(self):
+        """
+        Drops the least visited of the oldest few entries.
+        """
+        candidates = itertools.islice(self._nodes.items(),
+                                      _REPLACEMENT_CANDIDATES)
+        key, _ = min(candidates, key=lambda kv: kv[1].num_times_visited)
+        del self._nodes[key]
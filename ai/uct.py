@@ -3,14 +3,171 @@ This is the code for the UCT (Upper Confidence Bounds for Trees)
 algorithm.
 """
 
+from ai.budget import Budget
 from ai.node import Node
+from ai.options import SearchOptions
+from ai.transposition import TranspositionTable
+import ai.parallel as parallel
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
 import copy
 import math
 import random
-from time import process_time
+import threading
+from time import perf_counter
 
+# The Budget used by get_best_move when it isn't given one
+default_budget = Budget(max_cpu_time=1.5)
 
-def get_best_move(cur_state, reward_function):
+# The SearchOptions used by get_best_move when it isn't given any
+default_options = SearchOptions()
+
+# The Budget used by an AnytimeSearch when it isn't given one. Pondering
+# goes on for as long as the player takes, so this only limits how big
+# the tree may get.
+default_ponder_budget = Budget(max_nodes=1000000)
+
+# Stands in for a lock when only one thread is growing the tree
+_NO_LOCK = contextlib.nullcontext()
+
+# How many iterations an AnytimeSearch does at a time, between checking
+# whether it has been stopped. This should be a multiple of the budget's
+# check_every, or the budget's clocks may not be checked.
+_ANYTIME_ITERATIONS = 64
+
+# The tree from the last search made with each reward function, so the
+# next search from later on in the same game can carry on from it.
+# Maps reward_function -> (game state, move history at the root, root,
+#                          transposition table, number of Nodes in it)
+_saved_trees = {}
+
+
+class AnytimeSearch:
+    """
+    This class searches a game state in a background thread until it is
+    told to stop, so that the best move found so far can be taken at any
+    moment instead of waiting for a Budget to run out.
+
+    It is meant for pondering: searching while the player thinks about
+    their move. So the game state must not be changed between start()
+    and stop(). When it is stopped, the tree is saved just like after
+    get_best_move, so if options.reuse_tree is True, the next
+    get_best_move with the same reward_function on the same game state
+    carries on from the part of the tree under the moves taken since.
+
+    The search always runs in this process, whatever options.num_workers
+    is, since the tree has to be kept.
+
+    reward_function gives the reward of the player with the given index
+    (see GameState.current_player), which is the player to move in
+    game_state if it isn't given. When pondering, it is the other one.
+    """
+    def __init__(self, game_state, reward_function, budget=None,
+                 options=None, player=None):
+        self.game_state = game_state
+        self.reward_function = reward_function
+        if player is None:
+            player = game_state.current_player()
+        self.player = player
+        self.budget = default_ponder_budget if budget is None else budget
+        self.options = default_options if options is None else options
+        self._lock = threading.Lock()
+        self._stop_requested = threading.Event()
+        self._thread = None
+        self._state = None
+        self._root = None
+        self._table = None
+        self._num_nodes = None
+
+    def best_so_far(self):
+        """
+        Returns the best move found so far, or None if the search hasn't
+        tried any moves yet.
+        """
+        with self._lock:
+            if self._root is None or not self._root.children:
+                return None
+            return self._root.child_moves[_best_child_index(self._root, 0)]
+
+    def is_running(self):
+        """
+        Returns True if the search has been started and is still going.
+        It stops by itself once its budget runs out.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts searching in the background.
+        """
+        if self._thread is not None:
+            raise RuntimeError("An AnytimeSearch can only be started once")
+        self._state = copy.deepcopy(self.game_state)
+        if self.options.reuse_tree:
+            self._root, self._table, self._num_nodes =\
+                    _reusable_tree(self.game_state, self.reward_function)
+        if self._root is None:
+            self._root = Node()
+            self._table = _new_table(self.options)
+            self._num_nodes = 1
+        self._root.player = self.player
+        # A daemon thread, so that quitting in the middle of pondering
+        # doesn't have to wait for it
+        self._thread = threading.Thread(target=self._search, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the search, saves its tree for the next search to carry on
+        from, and returns the best move it found (or None).
+        """
+        if self._thread is None:
+            raise RuntimeError("The AnytimeSearch was never started")
+        self._stop_requested.set()
+        self._thread.join()
+        if self.options.reuse_tree:
+            _saved_trees[self.reward_function] =\
+                    (self.game_state, self._state.move_history(),
+                     self._root, self._table, self._num_nodes)
+        return self.best_so_far()
+
+    def _search(self):
+        """
+        Runs in the background thread, searching a few iterations at a
+        time until stop() is called or the budget runs out.
+        """
+        if self.options.num_threads > 1:
+            search_helper = _threaded_search_helper
+        else:
+            search_helper = _search_helper
+        chunk_budget = Budget(max_iterations=_ANYTIME_ITERATIONS)
+        if self._num_nodes is None:
+            # This thread is the one that isn't in a hurry, so it can
+            # take the time to tidy up the tree it is carrying on from
+            self._num_nodes = _tidy_tree(self._root, self._table)
+        num_iterations = 0
+        self.budget.start()
+        while not self._stop_requested.is_set() and\
+                not self.budget.exhausted(num_iterations, self._num_nodes):
+            with self._lock:
+                self._num_nodes, _ = search_helper(self._root, self._state,
+                                                   self.reward_function,
+                                                   chunk_budget,
+                                                   self._num_nodes,
+                                                   self.options, self._table)
+            num_iterations += _ANYTIME_ITERATIONS
+
+
+def clear_saved_trees():
+    """
+    Forgets the trees kept from earlier searches, so that the next
+    search starts from scratch.
+    """
+    _saved_trees.clear()
+
+
+def get_best_move(cur_state, reward_function, budget=None, options=None,
+                  stats=None):
     """
     Gets the AI's best move. Or at least, gets what it thinks is its
     best move.
@@ -20,37 +177,229 @@ def get_best_move(cur_state, reward_function):
     values indicated a good outcome for the AI.
     Note that this function is only ever evaluated on TERMINAL game states,
     so it is fine if it is undefined for non-terminal game states.
+    It is the reward of the player whose turn it is in cur_state, and
+    every other player is taken to get whatever that player doesn't.
+    The budget parameter is a Budget that limits how much computation
+    the search may spend. If it is not given, default_budget is used.
+    The options parameter is a SearchOptions that says how to search.
+    If it is not given, default_options is used.
+    If options.reuse_tree is True and cur_state is the same state object
+    that the last search with this reward_function was given, just with
+    some more moves taken since, the search carries on from the part of
+    that search's tree that is still reachable instead of starting over.
+    The stats parameter is an ai.stats.SearchStats to record what the
+    search did in, such as how many iterations it did and where the time
+    went. If it is not given, nothing is recorded.
     """
-    return _uct_search(cur_state, reward_function)
+    if budget is None:
+        budget = default_budget
+    if options is None:
+        options = default_options
+    return _uct_search(cur_state, reward_function, budget, options, stats)
+
+
+def _uct_search(game_state, reward_function, budget, options, stats=None):
+    if options.num_workers > 1:
+        # Root parallelization: each worker grows its own tree, and
+        # the statistics of the root's children are added together.
+        root = parallel.search_in_parallel(game_state, reward_function,
+                                           budget, options, stats)
+        if stats is not None:
+            stats.finish(root)
+        return root.child_moves[_best_child_index(root, 0)]
+
+    # The latency cap covers finding the tree to reuse and copying the
+    # state as well as the search itself
+    deadline = None
+    if budget.latency_cap is not None:
+        deadline = perf_counter() + budget.latency_cap
+
+    if options.seed is not None:
+        random.seed(options.seed)
+
+    # The search plays moves on its own copy of the state and takes them
+    # back again, so that is the only copy made for the whole search.
+    state = copy.deepcopy(game_state)
+    root = None
+    if options.reuse_tree:
+        root, table, num_nodes = _reusable_tree(game_state, reward_function)
+        if root is not None and num_nodes is None and table is not None and\
+                deadline is None:
+            # Without a latency cap there is time to tidy up the old tree
+            # now. With one, it waits for a search that has the time.
+            num_nodes = _tidy_tree(root, table)
+    if root is None:
+        root = Node()
+        table = _new_table(options)
+        num_nodes = 1
+    best_index, num_nodes = _search(root, state, reward_function, budget,
+                                    options, table, stats, num_nodes,
+                                    deadline)
+    if stats is not None:
+        stats.finish(root)
+
+    # This is the action that leads to the child with the highest
+    # reward. _search tries to make it the most visited one as well.
+    best_move = root.child_moves[best_index]
+    if options.reuse_tree:
+        _saved_trees[reward_function] =\
+                (game_state, state.move_history(), root, table, num_nodes)
+    return best_move
 
 
-def _uct_search(game_state, reward_function):
-    root = Node(game_state)
-    root.name = "root"
+def _search(root, state, reward_function, budget, options, table,
+            stats=None, num_nodes=None, deadline=None):
+    """
+    Searches from root, which the given state must be positioned at,
+    and returns the index of the best child of the root along with the
+    number of Nodes in the tree afterwards. num_nodes is the number
+    before. If it isn't given, it is only counted (by _tidy_tree) if the
+    budget limits the number of Nodes, and otherwise None is returned
+    for it too.
+
+    The search stops when the budget runs out, or before then if the
+    most visited child of the root is so far ahead that the rest of the
+    budget couldn't change that. Then, if the child with the best value
+    isn't also the most visited one, the search is extended until they
+    agree, by up to budget.max_extension more of the budget. No
+    iteration is started past the deadline, a perf_counter time, which
+    is budget.latency_cap from now if it isn't given.
+    """
+    if options.num_threads > 1:
+        search_helper = _threaded_search_helper
+    else:
+        search_helper = _search_helper
+
+    if deadline is None and budget.latency_cap is not None:
+        deadline = perf_counter() + budget.latency_cap
+
+    # Whoever's turn it is at the root is who the search is for
+    root.player = state.current_player()
+    count_unknown = num_nodes is None and budget.max_nodes is None
+    if count_unknown:
+        # Only the Nodes that this search adds are counted
+        num_nodes = 0
+    elif num_nodes is None:
+        num_nodes = _tidy_tree(root, table)
+    num_nodes, stop_reason = search_helper(root, state, reward_function,
+                                           budget, num_nodes, options,
+                                           table, stats, "leader_safe",
+                                           deadline)
+    best_index = _best_child_index(root, 0)
+    # Searching more can't change anything once the tree can't grow
+    if _child_is_not_most_visited(root.children[best_index], root) and\
+            budget.max_extension > 0 and not budget.tree_is_full(num_nodes):
+        if deadline is None or perf_counter() < deadline:
+            if stats is not None:
+                stats.extensions += 1
+            extension = budget.scaled(budget.max_extension)
+            num_nodes, stop_reason = search_helper(root, state,
+                                                   reward_function, extension,
+                                                   num_nodes, options, table,
+                                                   stats, "agreed", deadline)
+            if stop_reason == "budget":
+                stop_reason = "extension_budget"
+            best_index = _best_child_index(root, 0)
+    if stats is not None:
+        stats.stop_reasons.append(stop_reason)
+    if count_unknown:
+        num_nodes = None
+    return best_index, num_nodes
+
+
+def _search_new_tree(game_state, reward_function, budget, options,
+                     stats=None):
+    """
+    Searches game_state from a brand new root, and returns the root.
+    Unlike get_best_move, this takes its moves on game_state itself
+    rather than on a copy, but leaves it how it found it.
+    """
+    root = Node()
+    _search(root, game_state, reward_function, budget, options,
+            _new_table(options), stats)
+    return root
 
-    best_child_of_root = _search_helper(root, reward_function)
-    while _child_is_not_most_visited(best_child_of_root, root):
-        best_child_of_root = _search_helper(root, reward_function)
 
-    # This will usually, but not always, return the action that leads
-    # to the child with the highest reward. It COULD (since Cp is set
-    # to zero for this call) return the node that is most visited instead.
-    # This is often the node that is the best, but not always. So,
-    # one possible improvement is to check if the most visited root
-    # action is not also the one with the highest reward, and if it isn't,
-    # keep searching.
-    best_move = best_child_of_root.move_that_derived_this_node()
-    return best_move
+def _search_helper(root, state, reward_function, budget, num_nodes,
+                   options, table, stats=None, stop_when=None,
+                   deadline=None):
+    """
+    Searches from the root until _stop_reason says to stop, and returns
+    the number of Nodes in the tree afterwards along with the reason.
+    """
+    num_iterations = 0
+    budget.start()
+    while True:
+        stop_reason = _stop_reason(root, state, budget, num_iterations,
+                                   num_nodes, options, stop_when, deadline)
+        if stop_reason is not None:
+            return num_nodes, stop_reason
+        if _iteration(root, state, reward_function, options, table,
+                      stats):
+            num_nodes += 1
+        num_iterations += 1
+
+
+def _threaded_search_helper(root, state, reward_function, budget,
+                            num_nodes, options, table, stats=None,
+                            stop_when=None, deadline=None):
+    """
+    Does the same as _search_helper, but with options.num_threads threads
+    all growing the one tree (tree parallelization).
 
+    Walking and updating the tree is done under a lock, but the rollouts
+    are not, and each thread has its own copy of the state to play them
+    on. Under a free-threaded build of Python the rollouts run in
+    parallel; with the GIL the threads just take turns.
 
-def _search_helper(root, reward_function):
-    start_time = process_time()
-    while _within_computational_budget(start_time):
-        v = _tree_policy(root)
-        delta = _default_policy(v.state, reward_function)
-        _back_up(v, delta)
-    best_child_of_root = _best_child(root, 0)
-    return best_child_of_root
+    While a thread is rolling out from a Node, every Node on its path
+    carries options.virtual_loss extra visits that scored nothing, so
+    the other threads are steered towards different paths.
+
+    If stats are being recorded, the times are added up over all of the
+    threads, and include time spent waiting for the lock, so they can
+    add up to more than the time the search took.
+    """
+    lock = threading.Lock()
+    num_iterations = 0
+    stop_reason = None
+
+    def grow_tree(thread_state):
+        nonlocal num_iterations
+        nonlocal num_nodes
+        nonlocal stop_reason
+        while True:
+            with lock:
+                if stop_reason is None:
+                    stop_reason = _stop_reason(root, thread_state, budget,
+                                               num_iterations, num_nodes,
+                                               options, stop_when, deadline)
+                if stop_reason is not None:
+                    return
+                num_iterations += 1
+            added_node = _iteration(root, thread_state, reward_function,
+                                    options, table, stats, lock)
+            if added_node:
+                with lock:
+                    num_nodes += 1
+
+    budget.start()
+    thread_states = [copy.deepcopy(state)
+                     for _ in range(options.num_threads)]
+    with ThreadPoolExecutor(max_workers=options.num_threads) as executor:
+        futures = [executor.submit(grow_tree, s) for s in thread_states]
+        for future in futures:
+            # Raises any exception from the thread
+            future.result()
+    return num_nodes, stop_reason
+
+
+def _add_virtual_loss(path, amount):
+    """
+    Adds amount to the virtual loss of every Node on the path.
+    """
+    for v in path:
+        v.virtual_loss += amount
 
 
 def _child_is_not_most_visited(child, root):
@@ -63,63 +412,147 @@ def _child_is_not_most_visited(child, root):
 
 
 
-def _back_up(v, delta):
+def _back_up(path, delta, num_rollouts=1, played=None, backup="negamax"):
     """
-    Give delta to each node in the visit from the newly added node v
-    to the root.
-    Delta is the value of the terminal node that we reached through v.
+    Give delta to each node in the visit, that is, each node on the path
+    from the root to the newly added node.
+    (It has to be the path, rather than following parents up from the
+    new node, since with transpositions a node can have many parents.)
+    Delta is the reward vector of the terminal node that we reached
+    through the path (or the total of them all if num_rollouts rollouts
+    were done), with one reward for each player. Each node gets the
+    reward of the player who chose it.
+    If played is given, it is the (player, move) pairs of every move
+    taken from the root on, in the one rollout done, and the AMAF
+    statistics of the siblings along the path are updated too.
+    If backup is "root_player", every node gets the reward of the player
+    at the root instead (see SearchOptions.backup).
     """
-    while v is not None:
+    if backup == "root_player":
+        delta = [delta[path[0].player]] * len(delta)
+    for v in path:
         # num_times_visited is N in the algorithm
         # total_reward is Q, the total reward of all payouts so far pased
         # through this state
-        v.num_times_visited += 1
+        v.num_times_visited += num_rollouts
         v.total_reward += _delta_function(delta, v)
-        v = v.parent
+    if played is not None:
+        _back_up_amaf(path, delta, num_rollouts, played)
 
 
-def _best_child(v, c):
+def _back_up_amaf(path, delta, num_rollouts, played):
+    """
+    Gives delta to the AMAF statistics of every child of a node on the
+    path whose move its player took at any point after that node, in the
+    tree or in the rollouts. played holds the (player, move) pairs of
+    the moves from the root on, so the ones after path[i] start at
+    played[i].
+    """
+    # Going from the leaf up, so each node's set of later moves is the
+    # one below it plus the move out of it
+    later_moves = set(played[len(path) - 1:])
+    for i in reversed(range(len(path))):
+        if i < len(path) - 1:
+            later_moves.add(played[i])
+        v = path[i]
+        for child, move in zip(v.children, v.child_moves):
+            if (child.player, move) in later_moves:
+                child.amaf_visits += num_rollouts
+                child.amaf_reward += _delta_function(delta, child)
+
+
+def _best_child_index(v, c, rave_equivalence=None):
     # This function should never be called on a node that has no children
     assert(len(v.children) != 0)
 
     def valfunc(v_prime, v):
-        left = v_prime.total_reward / v_prime.num_times_visited
-        right = c * math.sqrt((2 * math.log(v.num_times_visited))\
-                / v_prime.num_times_visited)
+        # Virtual losses count as visits that didn't score anything
+        n_prime = v_prime.num_times_visited + v_prime.virtual_loss
+        n = v.num_times_visited + v.virtual_loss
+        left = v_prime.total_reward / n_prime
+        if rave_equivalence is not None:
+            left = _rave_value(v_prime, left, n_prime, rave_equivalence)
+        right = c * math.sqrt((2 * math.log(n)) / n_prime)
         return left + right
-    values_and_nodes = [(valfunc(v_prime, v), v_prime) for v_prime\
-            in v.children]
-    max_tup = max(values_and_nodes, key=lambda tup: tup[0])
+    values_and_indices = [(valfunc(v_prime, v), i) for i, v_prime\
+            in enumerate(v.children)]
+    max_tup = max(values_and_indices, key=lambda tup: tup[0])
+    return max_tup[1]
 
-    #if c is 0:
-    #    print("Scanning for best move.......")
-    #    for v_and_n in values_and_nodes:
-    #        print("Node value and num_times_visited: ", str((v_and_n[0], v_and_n[1].num_times_visited)))
-    #    print("Decided best move's value is: ", str(max_tup[0]))
 
-    for tup in values_and_nodes:
-        if tup == max_tup:
-            return tup[1]
-
-    # This should never be reached
-    assert(False)
-
-
-def _choose_untried_action_from(available_actions, already_chosen_actions):
-    # This is one place to put a neural network: we need a good way
-    # of choosing an untried action, rather than just uniform random
-    actions_to_choose_from =\
-            [a for a in available_actions if a not in already_chosen_actions]
-    return random.choice(actions_to_choose_from)
+def _best_puct_child_index(v, c, rave_equivalence=None):
+    """
+    Returns the index of the child of v with the highest PUCT score: its
+    mean reward plus an exploration term that is bigger for children
+    with a higher prior and fewer visits. c weights the exploration.
+    If rave_equivalence is given, the mean reward is blended with the
+    AMAF one, as in _rave_value.
+    """
+    assert(len(v.children) != 0)
+    n = v.num_times_visited + v.virtual_loss
+    scale = c * math.sqrt(n)
+    priors = v.priors
+    if priors is None:
+        # v was expanded without priors, such as by an earlier search of
+        # a tree that is being reused, so give every child the same one
+        priors = dict.fromkeys(v.child_moves, 1 / len(v.children))
+    best_index = 0
+    best_value = -math.inf
+    for i, (v_prime, move) in enumerate(zip(v.children, v.child_moves)):
+        n_prime = v_prime.num_times_visited + v_prime.virtual_loss
+        mean = v_prime.total_reward / n_prime
+        if rave_equivalence is not None:
+            mean = _rave_value(v_prime, mean, n_prime, rave_equivalence)
+        value = mean + scale * priors[move] / (1 + n_prime)
+        if value > best_value:
+            best_value = value
+            best_index = i
+    return best_index
+
+
+def _count_nodes(root):
+    """
+    Returns the number of Nodes in the tree under (and including) root.
+    """
+    return len(_reachable_nodes(root))
 
 
-def _default_policy(game_state, reward_function):
+def _default_policy(game_state, reward_function, options=None,
+                    played=None):
+    """
+    Plays the game out from game_state and returns the reward of where it
+    ends up, leaving game_state as it was. Moves are chosen by
+    options.rollout_policy if there is one, and uniformly at random
+    otherwise. After options.max_rollout_depth moves, the playout stops
+    and options.static_evaluator says what the reward would likely be.
+    If played is given, the (player, move) pair of each move taken is
+    added to it.
+    """
+    if options is None:
+        options = default_options
+    rollout_policy = options.rollout_policy
+    max_depth = options.max_rollout_depth
+    num_turns_taken = 0
     while not game_state.game_over():
-        # This function should be replaced with the policy network
-        action = random.choice(game_state.possible_moves())
-        game_state = copy.deepcopy(game_state)
+        if num_turns_taken == max_depth:
+            reward = options.static_evaluator(game_state, reward_function)
+            break
+        moves = game_state.possible_moves()
+        if rollout_policy is None:
+            action = random.choice(moves)
+        else:
+            action = rollout_policy(game_state, moves)
+        if played is not None:
+            played.append((game_state.current_player(), action))
         game_state.take_turn(action)
-    return reward_function(game_state)
+        num_turns_taken += 1
+    else:
+        reward = reward_function(game_state)
+
+    # Put the state back the way we found it
+    for _ in range(num_turns_taken):
+        game_state.undo_turn()
+    return reward
 
 
 def _delta_function(delta, v):
@@ -127,40 +560,360 @@ def _delta_function(delta, v):
     Denotes the component of the of the reward vector delta associated
     with the current player p at node v
     """
-    # This may need to change in a game that is for more than two players.
-    # It should return a value that takes into account how well each
-    # player is doing - so teammates should be maximized while enemies
-    # are minimized or whatever.
-    # But for two player games, you can simply return delta.
-    return delta
+    # The player at v is the one who took the move to v, so this is what
+    # that player's choice between v and its siblings should maximize.
+    # In a game with teams, this could add up the rewards of p's team.
+    return delta[v.player]
+
+
+def _expand(v, state, table, options):
+    # options.move_ordering and options.prior_function are where to put
+    # a neural network: a good way of choosing which untried action to
+    # try first, rather than just uniform random
+    action_to_try = v.next_untried_action(state, options.move_ordering,
+                                          options.prior_function)
+    v_prime = v.derive_child(state, action_to_try, table)
+    return v_prime
 
 
-def _expand(v):
-    available_actions = v.available_actions()
-    already_tried = v.already_tried_actions
-    action_to_try =\
-            _choose_untried_action_from(available_actions, already_tried)
-    v_prime = v.derive_child(action_to_try)
-    return v_prime
+def _iteration(root, state, reward_function, options, table, stats=None,
+               lock=None):
+    """
+    Does one iteration of the search: walks down the tree from the root
+    (expanding it by a Node if it can), rolls out from where it got to,
+    backs up the reward and puts the state back. Returns True if it
+    added a new Node to the tree.
+    If stats are given, the iteration and how long each part of it took
+    are recorded in them.
+    If a lock is given, other threads are growing the same tree, each
+    with their own state. Then the tree is only walked and updated while
+    holding the lock, and the Nodes on the path carry a virtual loss
+    while the rollouts are done.
+    """
+    threaded = lock is not None
+    if not threaded:
+        lock = _NO_LOCK
+    with lock:
+        if stats is not None:
+            start = perf_counter()
+            expansion_seconds = stats.expansion_seconds
+        path = _tree_policy(root, state, table, options, stats)
+        leaf = path[-1]
+        # If _tree_policy expanded a new Node, it hasn't been visited
+        # yet, not even by another thread
+        added_node = leaf.num_times_visited == 0 and leaf.virtual_loss == 0
+        if threaded:
+            _add_virtual_loss(path, options.virtual_loss)
+        if stats is not None:
+            stats.record_iteration(len(path) - 1, added_node)
+            stats.selection_seconds += perf_counter() - start -\
+                    (stats.expansion_seconds - expansion_seconds)
+            start = perf_counter()
+
+    played = _tree_moves(state, path, options)
+    delta = _rollouts(state, reward_function, options, root.player, played)
+    if stats is not None:
+        rollout_seconds = perf_counter() - start
+        start = perf_counter()
+
+    with lock:
+        if threaded:
+            _add_virtual_loss(path, -options.virtual_loss)
+        _back_up(path, delta, options.rollouts_per_leaf, played,
+                 options.backup)
+    _rewind(state, path)
+    if stats is not None:
+        with lock:
+            stats.rollout_seconds += rollout_seconds
+            stats.backup_seconds += perf_counter() - start
+    return added_node
+
+
+def _leader_is_safe(root, state, remaining_visits):
+    """
+    Returns True if no other child of the root could catch up with the
+    most visited one if it got all of remaining_visits more visits.
+    An untried move counts as a child with no visits.
+    """
+    visits = sorted((c.num_times_visited for c in root.children),
+                    reverse=True)
+    if len(visits) > 1:
+        runner_up = visits[1]
+    elif root.is_not_fully_expanded(state):
+        runner_up = 0
+    else:
+        # It is the only move there is
+        return True
+    return visits[0] - runner_up > remaining_visits
+
+
+def _may_widen(v, options):
+    """
+    Returns True if progressive widening lets v have another child: it
+    can have options.widening_children, plus one more for each time its
+    number of visits to the power of options.widening_exponent goes up
+    by one.
+    """
+    if options.widening_children is None:
+        return True
+    return len(v.children) < options.widening_children +\
+            v.num_times_visited ** options.widening_exponent
 
 
-def _tree_policy(v):
-    # This value of Cp works for rewards in the range of [0, 1]
-    Cp = 1 / math.sqrt(2)
-    while v.is_non_terminal():
-        if v.is_not_fully_expanded():
-            return _expand(v)
-        else:
-            v = _best_child(v, Cp)
-    return v
+def _new_table(options):
+    """
+    Returns a new TranspositionTable if the options call for one, or
+    None if they don't.
+    """
+    if options.transposition_table_size is None:
+        return None
+    return TranspositionTable(options.transposition_table_size)
+
+
+def _rave_value(v, mean, n, rave_equivalence):
+    """
+    Blends the mean reward of v, from its n visits, with its AMAF mean
+    reward. The AMAF reward is given all of the weight at first, since
+    it comes from many more playouts, and less and less as v gets
+    visited. It has half of the weight once n is about
+    rave_equivalence.
+    """
+    if v.amaf_visits == 0:
+        return mean
+    beta = math.sqrt(rave_equivalence / (3 * n + rave_equivalence))
+    return (1 - beta) * mean + beta * v.amaf_reward / v.amaf_visits
+
+
+def _reachable_nodes(root):
+    """
+    Returns a list of every Node that can be reached from root, each
+    listed once, including root itself.
+    """
+    seen = set()
+    nodes = []
+    to_visit = [root]
+    while to_visit:
+        v = to_visit.pop()
+        if id(v) not in seen:
+            seen.add(id(v))
+            nodes.append(v)
+            to_visit.extend(v.children)
+    return nodes
+
+
+def _reparent(nodes):
+    """
+    Makes sure that the parent of each of the given Nodes, other than
+    the root, is one of the given Nodes too, which are everything that
+    can be reached from the root. With transpositions, a Node's parent
+    is the first one that it was derived from, which may be in a part
+    of the old tree that isn't reachable any more, and would keep all
+    of that alive. Such a Node gets one of its reachable parents, and
+    the move from that one, instead.
+    """
+    reachable = set(id(v) for v in nodes)
+    for v in nodes:
+        for child, move in zip(v.children, v.child_moves):
+            if id(child.parent) not in reachable:
+                child.parent = v
+                child.move = move
+
+
+def _reusable_tree(game_state, reward_function):
+    """
+    Finds the Node for game_state in the tree saved by the last search
+    with this reward_function, and promotes it to be the root of its own
+    tree. Returns that root along with the tree's transposition table
+    and the number of Nodes in the tree, or (None, None, None) if there
+    is no such Node. The number of Nodes is None if the root had to be
+    promoted, since counting them means walking the whole tree. That is
+    left to _tidy_tree, for when there is time for it.
+    """
+    saved = _saved_trees.pop(reward_function, None)
+    if saved is None:
+        return None, None, None
+    saved_state, saved_history, root, table, num_nodes = saved
+    history = game_state.move_history()
+    if saved_state is not game_state or\
+            history[:len(saved_history)] != saved_history:
+        return None, None, None
+    if len(history) == len(saved_history):
+        # Nothing has changed since, so the tree is all still there
+        return root, table, num_nodes
+
+    # Walk down through the moves taken since (ours and the opponent's)
+    for move in history[len(saved_history):]:
+        root = root.child_for(move)
+        if root is None:
+            return None, None, None
+
+    # Without a transposition table, cutting the new root off from its
+    # parent leaves the rest of the old tree unreachable, so it can all
+    # be garbage collected. With one, _tidy_tree has to be called too.
+    root.parent = None
+    return root, table, None
+
+
+def _reward_vector(state, total_reward, num_rollouts, player):
+    """
+    Turns the total reward of num_rollouts rollouts for the given player
+    into a list of every player's total reward, indexed by player.
+    The reward function only gives the one player's reward, so every
+    other player is taken to be playing against them, and gets whatever
+    they didn't.
+    """
+    rewards = [num_rollouts - total_reward] * state.num_players()
+    rewards[player] = total_reward
+    return rewards
 
 
-def _within_computational_budget(start):
+def _rewind(state, path):
     """
-    Returns True if time still hasn't run out for the computer's turn.
+    Takes back the moves that walked the given state down the path.
     """
-    elapsed_time = process_time() - start
-    return elapsed_time < 1.5
+    for _ in range(len(path) - 1):
+        state.undo_turn()
 
 
+def _rollouts(state, reward_function, options, player, played=None):
+    """
+    Does options.rollouts_per_leaf rollouts from the given state and
+    returns the total of their rewards, as a reward vector. The reward
+    function gives the reward of the given player. Doing several per
+    leaf spreads the cost of walking the tree to the leaf and backing up
+    from it over more samples.
+    If played is given, the (player, move) pairs of the moves taken in
+    the rollouts are added to it.
+    """
+    total_reward = _total_reward(state, reward_function, options, played)
+    return _reward_vector(state, total_reward, options.rollouts_per_leaf,
+                          player)
+
 
+def _stop_reason(root, state, budget, num_iterations, num_nodes, options,
+                 stop_when=None, deadline=None):
+    """
+    Returns why a search from root, which the given state must be
+    positioned at, should stop now, or None if it shouldn't:
+        "tree_full" if the tree has as many Nodes as the budget allows,
+        "budget" if the rest of the budget has been used up,
+        "latency_cap" if it is past the deadline (a perf_counter time),
+            which is checked after every iteration but the first, so
+            that there is always a move to make,
+    and, only if stop_when is the same string,
+        "leader_safe" if the most visited child of the root can't be
+            overtaken in the rest of the budget,
+        "agreed" if the child of the root with the best value is also
+            the most visited one.
+    The last two are only checked every budget.check_every iterations.
+    """
+    if budget.exhausted(num_iterations, num_nodes):
+        if budget.tree_is_full(num_nodes):
+            return "tree_full"
+        return "budget"
+    if deadline is not None and num_iterations > 0 and\
+            perf_counter() >= deadline:
+        return "latency_cap"
+    if stop_when is None or num_iterations % budget.check_every != 0 or\
+            not root.children:
+        return None
+    if stop_when == "agreed":
+        best = root.children[_best_child_index(root, 0)]
+        if not _child_is_not_most_visited(best, root):
+            return "agreed"
+    elif stop_when == "leader_safe":
+        remaining = budget.remaining_iterations(num_iterations)
+        if remaining is not None and _leader_is_safe(
+                root, state, remaining * options.rollouts_per_leaf):
+            return "leader_safe"
+    return None
+
+
+def _total_reward(state, reward_function, options, played=None):
+    """
+    Does options.rollouts_per_leaf rollouts from the given state and
+    returns the total of their rewards according to reward_function.
+    If played is given, the (player, move) pairs of the moves taken in
+    the rollouts are added to it, unless a rollout_backend does them.
+    """
+    num_rollouts = options.rollouts_per_leaf
+    if options.solver is not None:
+        winner = options.solver(state)
+        if winner is not None:
+            # No need to play it out when we know how it ends
+            return num_rollouts * state.reward_for_winner(reward_function,
+                                                          winner)
+    if options.rollout_backend is not None:
+        return options.rollout_backend(state, reward_function, num_rollouts)
+    if num_rollouts == 1:
+        return _default_policy(state, reward_function, options, played)
+    total_reward = 0
+    for _ in range(num_rollouts):
+        total_reward += _default_policy(state, reward_function, options,
+                                        played)
+    return total_reward
+
+
+def _tidy_tree(root, table):
+    """
+    Drops the parts of the old tree that a promoted root can't reach from
+    the transposition table, and from the parent links of the Nodes it
+    can reach, so that they can be garbage collected. Returns the number
+    of Nodes in the tree under root.
+    """
+    nodes = _reachable_nodes(root)
+    if table is not None:
+        _reparent(nodes)
+        table.retain(nodes)
+    return len(nodes)
+
+
+def _tree_moves(state, path, options):
+    """
+    Returns a list of the (player, move) pairs of the moves that walked
+    the given state down the path, for the rollouts to add theirs to, if
+    the search uses RAVE. Returns None if it doesn't.
+    """
+    if options.rave_equivalence is None:
+        return None
+    num_moves = len(path) - 1
+    if num_moves == 0:
+        return []
+    moves = state.move_history()[-num_moves:]
+    return [(v.player, move) for v, move in zip(path[1:], moves)]
+
+
+def _tree_policy(v, state, table, options, stats=None):
+    """
+    Walks down the tree from v, taking each move on the given state as
+    it goes, and returns the path of Nodes it took. The last Node on
+    the path is the one that the state ends up at.
+    If stats are given, the time spent expanding is added to them.
+    """
+    path = [v]
+    while v.is_non_terminal(state):
+        if options.solver is not None and len(path) > 1 and\
+                options.solver(state) is not None:
+            # How the game ends from here is already known, so there is
+            # nothing to gain from growing the tree below here. (The root
+            # is still searched, to find out which move is best.)
+            return path
+        if v.is_not_fully_expanded(state) and _may_widen(v, options):
+            if stats is None:
+                path.append(_expand(v, state, table, options))
+            else:
+                start = perf_counter()
+                path.append(_expand(v, state, table, options))
+                stats.expansion_seconds += perf_counter() - start
+            return path
+        else:
+            if options.prior_function is None:
+                i = _best_child_index(v, options.exploration,
+                                      options.rave_equivalence)
+            else:
+                i = _best_puct_child_index(v, options.prior_exploration,
+                                           options.rave_equivalence)
+            state.take_turn(v.child_moves[i])
+            v = v.children[i]
+            path.append(v)
+    return path
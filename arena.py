@@ -0,0 +1,155 @@
+"""
+This is a headless entry point into the game framework, for playing
+lots of games with nobody at the keyboard, such as to see how a change
+to the AI does over thousands of games.
+To use it, execute it like so:
+python3 arena.py path/to/game path/to/AI --games 100 --metadata x,y
+It plays the AI against a copy of itself (or against random moves, with
+--opponent random) and writes one JSON line per game to stdout, or to
+the file given by --output.
+"""
+
+from ai.budget import Budget
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+from main import load_module_from_path
+import random
+import sys
+import time
+
+
+def main():
+    """
+    Parses the command line and runs the games.
+    """
+    args = _parse_args()
+    metadata_choices = args.metadata or [""]
+    games = []
+    for i in range(args.games):
+        metadata = metadata_choices[i % len(metadata_choices)]
+        answers = [a for a in metadata.split(",") if a]
+        seed = None if args.seed is None else args.seed + i
+        games.append((i, args.game, args.ai, answers, args.opponent, seed,
+                      args.iterations, args.cpu_time))
+
+    out = sys.stdout if args.output is None else open(args.output, "w")
+    totals = {"ai": 0, "opponent": 0, "draw": 0}
+    try:
+        for result in _play_all(games, args.workers):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            totals[result["result"]] += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print("AI won " + str(totals["ai"]) + ", opponent won " +\
+            str(totals["opponent"]) + ", drawn " + str(totals["draw"]),
+          file=sys.stderr)
+
+
+def play_game(game_index, game_path, ai_path, metadata_answers, opponent,
+              seed, iterations, cpu_time):
+    """
+    Plays one game from start to finish and returns a dict describing
+    how it went.
+    The game and AI modules are loaded afresh, since a game module keeps
+    its game in module globals.
+    """
+    game_module = load_module_from_path(game_path)
+    ai_module = load_module_from_path(ai_path)
+    if seed is not None:
+        random.seed(seed)
+    if iterations is not None or cpu_time is not None:
+        # Only AI modules that take a Budget can be limited like this
+        ai_module.default_budget = Budget(max_iterations=iterations,
+                                          max_cpu_time=cpu_time)
+
+    answers = list(metadata_answers)
+    while game_module.needs_more_metadata():
+        game_module.get_next_metadata_request_str()
+        if not answers:
+            raise ValueError("Not enough metadata answers for the game")
+        d = answers.pop(0)
+        if game_module.metadata_not_valid(d):
+            raise ValueError("Invalid metadata answer: " + d)
+        game_module.set_next_metadata(d)
+
+    game_module.initialize(ai_module)
+    start_time = time.perf_counter()
+    num_turns = 0
+    while not game_module.game_over():
+        if not game_module.players_turn():
+            game_module.take_ai_turn()
+        elif opponent == "random":
+            move = random.choice(game_module.possible_moves())
+            game_module.take_turn(move)
+        else:
+            game_module.take_ai_player_turn()
+        num_turns += 1
+
+    winner = game_module.get_winner()
+    if winner == game_module.get_ai_symbol():
+        result = "ai"
+    elif winner == ' ':
+        result = "draw"
+    else:
+        result = "opponent"
+    return {
+        "game": game_index,
+        "seed": seed,
+        "metadata": metadata_answers,
+        "opponent": opponent,
+        "winner": winner,
+        "result": result,
+        "num_turns": num_turns,
+        "seconds": time.perf_counter() - start_time,
+    }
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+            description="Plays the AI through many games without a human.")
+    parser.add_argument("game", help="path/to/game module")
+    parser.add_argument("ai", help="path/to/AI module")
+    parser.add_argument("--games", type=int, default=1,
+                        help="how many games to play")
+    parser.add_argument("--opponent", choices=["ai", "random"], default="ai",
+                        help="who plays the player's side")
+    parser.add_argument("--metadata", action="append",
+                        help="comma separated answers to the game's "
+                             "metadata requests, such as x,y; given more "
+                             "than once, the games take turns using each")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="how many games to play at once, each in its "
+                             "own process")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for game i is this plus i")
+    parser.add_argument("--iterations", type=int, default=None,
+                        help="limit each AI turn to this many iterations")
+    parser.add_argument("--cpu-time", type=float, default=None,
+                        help="limit each AI turn to this many CPU seconds")
+    parser.add_argument("--output", default=None,
+                        help="file to write the JSON lines to, instead of "
+                             "stdout")
+    return parser.parse_args()
+
+
+def _play_all(games, num_workers):
+    """
+    Plays the given games, num_workers at a time, and yields each one's
+    result as soon as it finishes.
+    """
+    if num_workers <= 1:
+        for game in games:
+            yield play_game(*game)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(play_game, *game) for game in games]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+This is the command line entry point for the benchmarks.
+To use it, execute it from the top of the repo like so:
+python3 -m bench --game connect4 --output results.json
+It prints (or writes) one JSON document holding every result, along
+with the commit it was run on, so that runs can be compared.
+"""
+
+import argparse
+from bench.suite import GAMES, run_all
+import json
+import platform
+import subprocess
+import sys
+
+
+def main():
+    """
+    Parses the command line and runs the benchmarks.
+    """
+    args = _parse_args()
+    game_names = sorted(GAMES) if args.game == "all" else [args.game]
+    results = []
+    for game in game_names:
+        results.extend(run_all(game, args.seed, args.scale))
+
+    report = {
+        "commit": _current_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "scale": args.scale,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+def _current_commit():
+    """
+    Returns the git commit that is checked out, or None if there isn't one.
+    """
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True,
+                             text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+            prog="python3 -m bench",
+            description="Benchmarks the games and the UCT search.")
+    parser.add_argument("--game", choices=sorted(GAMES) + ["all"],
+                        default="all", help="which game to benchmark")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed that every benchmark starts from")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiplies how much work each benchmark "
+                             "does; use less than 1 for a quick run")
+    parser.add_argument("--output", default=None,
+                        help="file to write the JSON to, instead of stdout")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+"""
+The benchmarks themselves. Each one sets up its own positions from a
+fixed seed, times something, and returns a dict of what it measured.
+"""
+
+from ai.budget import Budget
+from ai.node import Node
+from ai.options import SearchOptions
+import ai.uct as uct
+import copy
+import games.connect4.board as connect4_board
+import games.connect4.gamestate as connect4_gamestate
+import games.connect4.metadata as connect4_metadata
+import games.connect4.solver as connect4_solver
+import games.tictactoe.board as tictactoe_board
+import games.tictactoe.gamestate as tictactoe_gamestate
+import games.tictactoe.metadata as tictactoe_metadata
+import games.tictactoe.solver as tictactoe_solver
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+# For each game: its gamestate module, its metadata module, the check
+# its board makes for a win on one player's bitboard, and the most
+# random moves to make when setting up a mid-game position
+GAMES = {
+    "connect4": (connect4_gamestate, connect4_metadata,
+                 connect4_board.has_four, 20),
+    "tictactoe": (tictactoe_gamestate, tictactoe_metadata,
+                  tictactoe_board.IS_WIN.__getitem__, 4),
+}
+
+# For each game: its solver, and positions (as the moves that lead to
+# them) where only some of the moves keep the best result the player to
+# move can get. The solver works out which moves those are. The first
+# few can be solved with an immediate win or block; the rest can't, and
+# need the search to look a few moves ahead, past forks or moves that
+# give the opponent a forced reply.
+PUZZLES = {
+    "connect4": (connect4_solver.solve, (
+        (6, 6, 2, 3, 5, 2, 3, 4, 5, 3, 3, 2, 3, 1, 2, 2, 6, 4, 0, 0, 0, 4,
+         5, 5, 4, 0, 1, 0, 6, 2),
+        (0, 1, 4, 0, 0, 6, 6, 3, 2, 1, 1, 4, 2, 4, 6, 6, 3, 6, 1, 4, 3, 2,
+         3, 2, 1, 1, 4, 2, 5, 3),
+        (3, 6, 3, 6, 5, 4, 6, 1, 5, 2, 4, 1, 0, 2, 2, 2, 6, 5, 5, 0, 3, 3,
+         1, 0, 2, 5, 0, 1, 2, 4),
+        (3, 1, 1, 5, 0, 1, 1, 0, 2, 0, 5, 0, 6, 3, 4, 2, 0, 5, 5, 0, 5, 2,
+         5, 6, 1, 4, 6, 4, 3),
+        (1, 1, 4, 4, 4, 2, 4, 2, 5, 5, 1, 2, 0, 5, 2, 6, 6, 4, 6, 5, 0, 2,
+         0, 6, 2, 0, 3, 4, 3, 6, 5),
+        (4, 0, 3, 6, 6, 2, 1, 3, 5, 6, 3, 6, 1, 0, 0, 2, 6, 1, 2, 2, 2, 1,
+         0, 0, 1, 2, 6, 3, 5, 4, 3),
+        (0, 2, 1, 0, 1, 4, 6, 1, 5, 2, 4, 6, 1, 6, 3, 6, 5, 5, 4, 4, 1, 4,
+         4, 0, 2, 5, 6, 2, 5),
+        (0, 3, 5, 6, 5, 0, 1, 5, 2, 0, 6, 5, 0, 4, 2, 6, 5, 1, 6, 3, 4, 0,
+         4, 6, 2, 5, 0, 1, 6, 2),
+    )),
+    "tictactoe": (tictactoe_solver.solve, (
+        ((1, 0), (0, 0), (1, 2)),
+        ((0, 2), (2, 1), (2, 0)),
+        ((1, 1), (0, 0), (0, 2), (1, 0)),
+        ((2, 0), (2, 2), (1, 1)),
+        ((2, 0), (2, 2), (0, 1), (0, 0)),
+        ((0, 0), (1, 1), (2, 2)),
+        ((1, 1), (0, 0), (2, 2)),
+        ((0, 0), (0, 1)),
+        ((2, 0), (1, 2)),
+        ((2, 1), (0, 0)),
+        ((2, 1), (2, 2), (1, 0)),
+        ((0, 2), (2, 2), (1, 0)),
+        ((1, 2), (0, 2), (2, 1)),
+    )),
+}
+
+# For each game, how many iterations to search between checks of the
+# move the search would pick, when measuring how fast it converges
+_CONVERGENCE_CHUNKS = {"connect4": 25, "tictactoe": 5}
+
+
+def run_all(game, seed, scale):
+    """
+    Runs every benchmark on the given game and returns a list of their
+    results. scale multiplies how much work each benchmark does.
+    """
+    results = []
+    for benchmark in (bench_rollouts, bench_iterations, bench_tree_memory,
+                      bench_latency, bench_win_check, bench_possible_moves,
+                      bench_deepcopy, bench_convergence):
+        random.seed(seed)
+        result = benchmark(game, scale)
+        result["benchmark"] = benchmark.__name__[len("bench_"):]
+        result["game"] = game
+        result["seed"] = seed
+        results.append(result)
+    return results
+
+
+def bench_convergence(game, scale):
+    """
+    Measures how many iterations the search needs before it settles on a
+    correct move in each of the game's puzzles, both with each node
+    scored for the player who chose it ("negamax") and with every node
+    scored for the player at the root, as the search used to ("legacy").
+    A puzzle it never settles on counts as the whole budget.
+    """
+    max_iterations = int(4000 * scale) or 1
+    result = {"puzzles": len(PUZZLES[game][1]),
+              "max_iterations": max_iterations}
+    for backup in ("legacy", "negamax"):
+        iterations = [_iterations_to_correct_move(game, moves, backup,
+                                                  max_iterations)
+                      for moves in PUZZLES[game][1]]
+        result[backup + "_solved"] = sum(n is not None for n in iterations)
+        result[backup + "_mean_iterations"] = statistics.mean(
+            max_iterations if n is None else n for n in iterations)
+    return result
+
+
+def bench_deepcopy(game, scale):
+    """
+    Times GameState.__deepcopy__ on mid-game positions.
+    """
+    states = _mid_game_states(game, 50)
+    num_copies = int(2000 * scale)
+    start = time.perf_counter()
+    for i in range(num_copies):
+        copy.deepcopy(states[i % len(states)])
+    elapsed = time.perf_counter() - start
+    return {"calls": num_copies, "us_per_call": 1e6 * elapsed / num_copies}
+
+
+def bench_iterations(game, scale):
+    """
+    Measures full UCT iterations (select, expand, roll out, back up) per
+    second from the start of the game.
+    """
+    num_iterations = int(2000 * scale) or 1
+    budget = Budget(max_iterations=num_iterations)
+    options = SearchOptions(reuse_tree=False)
+    state = new_state(game)
+    reward_function = _reward_function(game, state)
+    start = time.perf_counter()
+    root = uct._search_new_tree(state, reward_function, budget, options)
+    elapsed = time.perf_counter() - start
+    # The search might have stopped short of the budget, or gone past it
+    # if its best child wasn't also its most visited, so count what it
+    # actually did.
+    return {"iterations": root.num_times_visited,
+            "iterations_per_second": root.num_times_visited / elapsed}
+
+
+def bench_latency(game, scale):
+    """
+    Measures how long get_best_move takes, with a fixed iteration budget,
+    from a spread of positions.
+    """
+    budget = Budget(max_iterations=int(500 * scale) or 1)
+    options = SearchOptions(reuse_tree=False)
+    latencies = []
+    for state in _mid_game_states(game, 20):
+        reward_function = _reward_function(game, state)
+        start = time.perf_counter()
+        uct.get_best_move(state, reward_function, budget, options)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "iterations_per_call": budget.max_iterations,
+        "ms_p50": 1000 * _percentile(latencies, 50),
+        "ms_p90": 1000 * _percentile(latencies, 90),
+        "ms_p99": 1000 * _percentile(latencies, 99),
+        "ms_mean": 1000 * statistics.mean(latencies),
+    }
+
+
+def bench_possible_moves(game, scale):
+    """
+    Times GameState.possible_moves on mid-game positions.
+    """
+    states = _mid_game_states(game, 50)
+    num_calls = int(20000 * scale)
+    start = time.perf_counter()
+    for i in range(num_calls):
+        states[i % len(states)].possible_moves()
+    elapsed = time.perf_counter() - start
+    return {"calls": num_calls, "us_per_call": 1e6 * elapsed / num_calls}
+
+
+def bench_rollouts(game, scale):
+    """
+    Measures raw _default_policy playouts per second from the start of
+    the game.
+    """
+    state = new_state(game)
+    reward_function = _reward_function(game, state)
+    num_rollouts = int(2000 * scale)
+    start = time.perf_counter()
+    for _ in range(num_rollouts):
+        uct._default_policy(state, reward_function)
+    elapsed = time.perf_counter() - start
+    return {"rollouts": num_rollouts,
+            "rollouts_per_second": num_rollouts / elapsed}
+
+
+def bench_tree_memory(game, scale):
+    """
+    Measures how big a tree gets, and how many bytes each Node takes up,
+    over a search from the start of the game.
+    """
+    budget = Budget(max_iterations=int(5000 * scale) or 1)
+    options = SearchOptions(reuse_tree=False)
+    state = new_state(game)
+    reward_function = _reward_function(game, state)
+    tracemalloc.start()
+    try:
+        root = uct._search_new_tree(state, reward_function, budget, options)
+        allocated, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    num_nodes = uct._count_nodes(root)
+    return {
+        "nodes": num_nodes,
+        "bytes_per_node": allocated / num_nodes,
+        "node_object_bytes": sys.getsizeof(root),
+        "peak_traced_bytes": peak,
+    }
+
+
+def bench_win_check(game, scale):
+    """
+    Times the check the board makes for a win after each move (has_four
+    for connect4, a lookup in IS_WIN for tictactoe) on the bitboards of
+    both players in mid-game positions. The boards' four_in_a_row and
+    three_in_a_row only give back the result of that check, so they
+    aren't what is timed.
+    """
+    has_won = GAMES[game][2]
+    masks = [mask for state in _mid_game_states(game, 50)
+             for mask in state._board.as_bitboards()[:2]]
+    num_calls = int(20000 * scale)
+    start = time.perf_counter()
+    for i in range(num_calls):
+        has_won(masks[i % len(masks)])
+    elapsed = time.perf_counter() - start
+    return {"calls": num_calls, "us_per_call": 1e6 * elapsed / num_calls}
+
+
+def new_state(game):
+    """
+    Returns the GameState for the start of a game, with the player going
+    first as x.
+    """
+    gamestate_module, metadata_module, _, _ = GAMES[game]
+    metadata = metadata_module.MetaData()
+    metadata.player_symbol = 'x'
+    metadata.ai_symbol = 'o'
+    metadata.player_goes_first = True
+    return gamestate_module.GameState(metadata, uct)
+
+
+def _correct_moves(state, solve):
+    """
+    Returns the set of moves from the given state that keep the best
+    result its player to move can get, according to the given solver.
+    """
+    mover = state.current_player_symbol()
+    ranks = {}
+    for move in state.possible_moves():
+        state.take_turn(move)
+        winner = solve(state)
+        state.undo_turn()
+        ranks[move] = 2 if winner == mover else 1 if winner == ' ' else 0
+    best = max(ranks.values())
+    return {move for move, rank in ranks.items() if rank == best}
+
+
+def _iterations_to_correct_move(game, moves, backup, max_iterations):
+    """
+    Searches the puzzle reached by the given moves a chunk at a time,
+    with the given kind of backup, and returns the number of iterations
+    after which the move the search would pick was correct every time
+    it was checked, or None if it wasn't correct at the end.
+    """
+    state = new_state(game)
+    for move in moves:
+        state.take_turn(move)
+    correct_moves = _correct_moves(state, PUZZLES[game][0])
+    reward_function = _reward_function(game, state)
+
+    # The legacy backup gives every node the root player's reward, so the
+    # opponent's nodes are chosen as if they were trying to help them
+    options = SearchOptions(reuse_tree=False,
+                            backup="root_player" if backup == "legacy"
+                            else "negamax")
+    root = Node()
+    root.player = state.current_player()
+    table = uct._new_table(options)
+    settled_at = None
+    num_nodes = 1
+    for done in range(0, max_iterations, _CONVERGENCE_CHUNKS[game]):
+        chunk = min(_CONVERGENCE_CHUNKS[game], max_iterations - done)
+        num_nodes, _ = uct._search_helper(
+                root, state, reward_function, Budget(max_iterations=chunk),
+                num_nodes, options, table)
+        best = root.children[uct._best_child_index(root, 0)]
+        if best.move not in correct_moves:
+            settled_at = None
+        elif settled_at is None:
+            settled_at = done + chunk
+    return settled_at
+
+
+def _mid_game_states(game, num_states):
+    """
+    Returns num_states positions reached by random moves from the start
+    of the game, none of which is over yet.
+    """
+    states = []
+    while len(states) < num_states:
+        state = new_state(game)
+        num_moves = random.randint(0, GAMES[game][3])
+        for _ in range(num_moves):
+            if state.game_over():
+                break
+            state.take_turn(random.choice(state.possible_moves()))
+        if not state.game_over():
+            states.append(state)
+    return states
+
+
+def _percentile(sorted_values, percent):
+    """
+    Returns the given percentile of a sorted list, by nearest rank.
+    """
+    index = max(0, int(round(percent / 100 * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+def _reward_function(game, state):
+    """
+    Returns the evaluation function that gives the reward of whoever's
+    turn it is in the given state, which is who the search is for.
+    """
+    if state.players_turn:
+        return GAMES[game][0]._player_evaluation_function
+    return GAMES[game][0]._evaluation_function
@@ -2,33 +2,74 @@
 This module holds the connect 4 game's Board class.
 """
 import os
+import random
+
+# Board dimensions
+NUM_ROWS = 6
+NUM_COLS = 7
+
+# Each column takes up this many bits in a bitboard: one per row, plus
+# an always-empty sentinel bit on top so that shifting a line of discs
+# sideways or diagonally can never wrap around into the next column.
+COL_STRIDE = NUM_ROWS + 1
+
+# The shifts that move a disc one step along each of the four line
+# directions: vertical, horizontal, and the two diagonals.
+DIRECTIONS = (1, COL_STRIDE, COL_STRIDE - 1, COL_STRIDE + 1)
+
+# Random 64 bit keys for Zobrist hashing, one per symbol per bitboard
+# bit. They come from a fixed seed so that every process agrees on them.
+_zobrist_rng = random.Random(0xC4)
+_ZOBRIST_KEYS = {
+    symbol: [_zobrist_rng.getrandbits(64)
+             for _ in range(COL_STRIDE * NUM_COLS)]
+    for symbol in ('x', 'o')
+}
+
+# Maps a mask with bit c set for each column c that isn't full to the
+# tuple of those columns, so the legal moves never have to be built.
+_MOVES_FOR_MASK = tuple(
+    tuple(c for c in range(NUM_COLS) if mask & (1 << c))
+    for mask in range(1 << NUM_COLS)
+)
+
 
 class Board:
     """
     This class represents the game's board.
 
+    The board is stored as a pair of bitboards, one for each symbol, plus
+    the height of each column. Bit (col * 7 + row) of a bitboard is set
+    if that symbol has a disc at that spot. Bit col of the open mask is
+    set if that column isn't full.
+
     IMPORTANT:
     A board has its rows indexed from 0, starting from the BOTTOM.
     """
     def __init__(self):
-        self._rows = []
-        for row_index in range(6):
-            row = [" " for _ in range(7)]
-            self._rows.append(row)
+        self._x_mask = 0
+        self._o_mask = 0
+        self._heights = [0 for _ in range(NUM_COLS)]
+        self._open_mask = (1 << NUM_COLS) - 1
+        self._num_discs = 0
+        self._winner = None
+        self._num_discs_at_win = None
+        self._hash = 0
 
     def __str__(self):
         nl = os.linesep
         s = nl
-        for row in reversed(self._rows):
+        for row_index in reversed(range(NUM_ROWS)):
             row_str = ""
-            for spot in row:
+            for col_index in range(NUM_COLS):
+                spot = self._symbol_at(row_index, col_index)
                 if spot == ' ':
                     row_str += "|___"
                 else:
                     row_str += "|_" + spot + "_"
             row_str += "|" + nl
             s += row_str
-        rng = [str(i) for i in range(7)]
+        rng = [str(i) for i in range(NUM_COLS)]
         nums = "   ".join(rng)
         s += nl + "  " + nums
         return s
@@ -39,82 +80,103 @@ class Board:
         """
         assert(symbol == 'x' or symbol == 'o')
         assert(self.valid_move(move))
-        r = self._find_row_from_col(move)
-        self._rows[r][move] = symbol
+        index = move * COL_STRIDE + self._heights[move]
+        bit = 1 << index
+        self._heights[move] += 1
+        if self._heights[move] == NUM_ROWS:
+            self._open_mask &= ~(1 << move)
+        self._num_discs += 1
+        self._hash ^= _ZOBRIST_KEYS[symbol][index]
+        if symbol == 'x':
+            self._x_mask |= bit
+            mask = self._x_mask
+        else:
+            self._o_mask |= bit
+            mask = self._o_mask
+
+        # Nobody had four in a row before this disc went in (or else
+        # we would already have a winner), so any four in a row in the
+        # mover's mask has to run through the disc that was just placed.
+        if self._winner is None and has_four(mask):
+            self._winner = symbol
+            self._num_discs_at_win = self._num_discs
+
+    def undo(self, move):
+        """
+        Removes the top disc from the given column.
+        """
+        assert(self._heights[move] > 0)
+        self._heights[move] -= 1
+        self._open_mask |= 1 << move
+        index = move * COL_STRIDE + self._heights[move]
+        bit = 1 << index
+        symbol = 'x' if self._x_mask & bit else 'o'
+        self._hash ^= _ZOBRIST_KEYS[symbol][index]
+        self._x_mask &= ~bit
+        self._o_mask &= ~bit
+        if self._winner is not None and\
+                self._num_discs == self._num_discs_at_win:
+            self._winner = None
+            self._num_discs_at_win = None
+        self._num_discs -= 1
+
+    def as_bitboards(self):
+        """
+        Returns the x bitboard, the o bitboard and a tuple of the column
+        heights, for code that works on the bitboards directly.
+        """
+        return self._x_mask, self._o_mask, tuple(self._heights)
 
     def four_in_a_row(self):
         """
         Returns True if x or if o has four in a row.
         Also returns who won if there is a winner (otherwise None).
         """
-        rows, winner = self._check_for_four(self._rows)
-        if rows:
-            return True, winner
-        cols, winner = self._check_for_four(self._cols())
-        if cols:
-            return True, winner
-        diag, winner = self._check_for_four(self._diagonals())
-        if diag:
-            return True, winner
-
-        return False, None
+        if self._winner is None:
+            return False, None
+        return True, self._winner
 
-    def valid_move(self, move):
+    def legal_moves(self):
         """
-        Checks the given row, col tuple for validity in the game board.
+        Returns a tuple of the columns that aren't full, in order. It is
+        kept up to date as discs are placed and removed, so this is free
+        to call.
         """
-        return not self._column_is_full(move)
-
-    def _check_for_four(self, ls):
-        for row_col_or_diag in ls:
-            num_in_a_row = 0
-            last_seen = None
-            for spot in row_col_or_diag:
-                if spot == last_seen and spot != ' ':
-                    num_in_a_row += 1
-                else:
-                    last_seen = spot
-                    num_in_a_row = 1
-                if num_in_a_row >= 4:
-                    return True, last_seen
-        return False, ' '
-
-    def _column_is_full(self, col_index):
-        column = [row[col_index] for row in self._rows]
-        for spot in column:
-            if spot == ' ':
-                return False
-        return True
-
-    def _cols(self):
-        for i in range(7):
-            yield [row[i] for row in self._rows]
-
-    def _diagonals(self):
-        for j in range(3, 9):
-            yield [self._rows[i][j - i] for i in range(len(self._rows))\
-                    if (j - i) < 7 and (j - i) >= 0]
+        return _MOVES_FOR_MASK[self._open_mask]
 
-        for j in range(-2, 3):
-            yield [self._rows[i][i + j] for i in range(len(self._rows))\
-                    if (i + j) < 7 and (i + j) >= 0]
-
-    def _find_row_from_col(self, col_index):
+    def zobrist_hash(self):
         """
-        Finds the right row from the given column
+        Returns a 64 bit hash of where the discs are. It is kept up to
+        date as discs are placed and removed, so this is free to call.
         """
-        column = [row[col_index] for row in self._rows]
-        for i, spot in enumerate(column):
-            # Looking from the bottom row up
-            if spot == ' ':
-                return i
-
-        # If it ever gets here, this function is not implemented correctly
-        assert(False)
-
-
-
+        return self._hash
 
+    def valid_move(self, move):
+        """
+        Checks the given column index for validity in the game board.
+        """
+        return 0 <= move < NUM_COLS and self._heights[move] < NUM_ROWS
 
+    def _symbol_at(self, row_index, col_index):
+        """
+        Returns the symbol at the given spot, or ' ' if it is empty.
+        """
+        bit = 1 << (col_index * COL_STRIDE + row_index)
+        if self._x_mask & bit:
+            return 'x'
+        elif self._o_mask & bit:
+            return 'o'
+        else:
+            return ' '
 
 
+def has_four(mask):
+    """
+    Returns True if the given bitboard contains four set bits in a row
+    along any of the line directions.
+    """
+    for shift in DIRECTIONS:
+        pairs = mask & (mask >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
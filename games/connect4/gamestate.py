@@ -4,6 +4,14 @@ Module to hold the Connect4 GameState class.
 import copy
 from games.connect4.board import Board
 import os
+import random
+
+# Zobrist key that is mixed into the hash when it is the player's turn
+_PLAYERS_TURN_KEY = random.Random(0xC4 + 1).getrandbits(64)
+
+# The indexes that current_player() gives the player and the computer
+_PLAYER_INDEX = 0
+_AI_INDEX = 1
 
 class GameState:
     """
@@ -17,7 +25,10 @@ class GameState:
         self.players_turn = self._metadata.player_goes_first
         self._incoming_move = None
         self._move_that_derived_this_state = None
+        self._move_stack = []
         self.winner = None
+        self._possible_moves = ()
+        self._update_status()
 
     def __str__(self):
         s = "State: "
@@ -37,12 +48,29 @@ class GameState:
                 setattr(result, k, copy.deepcopy(v, memo))
         return result
 
+    def __getstate__(self):
+        # We can't pickle _ai because it is a module. Whoever unpickles
+        # this state (such as a search worker process) doesn't get one.
+        d = self.__dict__.copy()
+        d["_ai"] = None
+        return d
+
+    def current_player(self):
+        """
+        Returns the index of the player whose turn it is, for code that
+        keeps something for each player, such as a reward for each.
+        """
+        if self.players_turn:
+            return _PLAYER_INDEX
+        else:
+            return _AI_INDEX
+
     def current_player_symbol(self):
         """
         Gets the current player's symbol
         """
         if self.players_turn:
-            return self._metadata.players_symbol
+            return self._metadata.player_symbol
         else:
             return self._metadata.ai_symbol
 
@@ -50,13 +78,7 @@ class GameState:
         """
         Returns True if the game is over, False if it is not.
         """
-        there_is_a_winner, winner = self._board.four_in_a_row()
-        self.winner = winner
-        if len(self.possible_moves()) == 0:
-            # There is a draw, rather than a winner
-            there_is_a_winner = True
-            self.winner = ' '
-        return there_is_a_winner
+        return self.winner is not None
 
     def get_formatted_display(self):
         """
@@ -96,6 +118,13 @@ class GameState:
         except ValueError:
             return False, "Please enter a valid column between 0 and 6"
 
+    def move_history(self):
+        """
+        Returns the moves that have been taken so far in this game, in
+        the order they were taken.
+        """
+        return tuple(self._move_stack)
+
     def needs_more_player_input(self):
         """
         Returns True if the GameState object does not have enough
@@ -104,13 +133,29 @@ class GameState:
         # We only need one item from the user
         return self._incoming_move is None
 
+    def num_players(self):
+        """
+        Returns how many players there are.
+        """
+        return 2
+
     def possible_moves(self):
         """
         Returns the set of all actions that lead to a legal next turn from
-        the current state.
+        the current state, as a tuple.
+        """
+        return self._possible_moves
+
+    def reward_for_winner(self, reward_function, winner):
+        """
+        Returns the reward that reward_function would give a finished
+        game that the given symbol won (or ' ' for a draw). This is for
+        code that finds out how a game ends without playing it out on
+        this state, such as a batch of simulated games.
         """
-        return [move for move in self._action_set()\
-                if self._board.valid_move(move)]
+        finished_state = copy.copy(self)
+        finished_state.winner = winner
+        return reward_function(finished_state)
 
     def set_next_input(self, info):
         """
@@ -121,16 +166,37 @@ class GameState:
         # There is only the one thing: the col index
         self._incoming_move = int(info)
 
+    def start_pondering(self):
+        """
+        Starts the computer searching for its next move in the
+        background, while the player decides on theirs. Returns the
+        search, which must be stopped before the player's turn is taken,
+        or None if the AI can't ponder.
+        """
+        if self.game_over() or not hasattr(self._ai, "AnytimeSearch"):
+            return None
+        search = self._ai.AnytimeSearch(self, _evaluation_function,
+                                        player=_AI_INDEX)
+        search.start()
+        return search
+
     def take_ai_turn(self):
         """
         Takes the computer's turn.
         """
         move = self._ai.get_best_move(self, _evaluation_function)
-        self._board.place(move, self._metadata.ai_symbol)
-        self._move_that_derived_this_state = move
-        self._incoming_move = None
+        self._place(move, self._metadata.ai_symbol)
         self.players_turn = True
 
+    def take_ai_player_turn(self):
+        """
+        Takes the player's turn for them, with the computer choosing the
+        move that is best for the player.
+        """
+        move = self._ai.get_best_move(self, _player_evaluation_function)
+        self._place(move, self._metadata.player_symbol)
+        self.players_turn = False
+
     def take_turn(self, move):
         """
         This function can be used to take a turn when the caller does
@@ -140,31 +206,73 @@ class GameState:
         UI's calls.
         """
         if self.players_turn:
-            self._board.place(move, self._metadata.player_symbol)
+            self._place(move, self._metadata.player_symbol)
             self.players_turn = False
         else:
-            self._board.place(move, self._metadata.ai_symbol)
+            self._place(move, self._metadata.ai_symbol)
             self.players_turn = True
-        self._move_that_derived_this_state = move
-        self._incoming_move = None
 
     def take_player_turn(self):
         """
         Takes the player's turn.
         """
         move = self._incoming_move
-        self._board.place(move, self._metadata.player_symbol)
+        self._place(move, self._metadata.player_symbol)
+        self.players_turn = False
+
+    def undo_turn(self):
+        """
+        Takes back the last turn that was taken (by either side), putting
+        this state back the way it was before that turn.
+        This is the counterpart of take_turn(), and lets a search play
+        moves on a single state and then rewind it instead of copying it.
+        """
+        move = self._move_stack.pop()
+        self._board.undo(move)
+        self.players_turn = not self.players_turn
+        if self._move_stack:
+            self._move_that_derived_this_state = self._move_stack[-1]
+        else:
+            self._move_that_derived_this_state = None
+        self._incoming_move = None
+        self._update_status()
+
+    def zobrist_hash(self):
+        """
+        Returns a 64 bit hash of this position (the board and whose turn
+        it is). Positions reached by different orders of the same moves
+        hash the same.
+        """
+        if self.players_turn:
+            return self._board.zobrist_hash() ^ _PLAYERS_TURN_KEY
+        return self._board.zobrist_hash()
+
+    def _place(self, move, symbol):
+        """
+        Places the given symbol on the board with the given move, and
+        records the move as the one taken last.
+        """
+        self._board.place(move, symbol)
         self._move_that_derived_this_state = move
+        self._move_stack.append(move)
         self._incoming_move = None
-        self.players_turn = False
+        self._update_status()
 
-    def _action_set(self):
+    def _update_status(self):
         """
-        Generates all possible actions. Does not pay attention to
-        whether they are legal or not for the current game state.
+        Works out who has won (if anyone) and what the legal moves are,
+        once each time the board changes, so that game_over(),
+        get_winner() and possible_moves() only have to read them.
         """
-        for c in range(7):
-            yield c
+        there_is_a_winner, winner = self._board.four_in_a_row()
+        self._possible_moves = self._board.legal_moves()
+        if there_is_a_winner:
+            self.winner = winner
+        elif len(self._possible_moves) == 0:
+            # There is a draw, rather than a winner
+            self.winner = ' '
+        else:
+            self.winner = None
 
 
 def _evaluation_function(state):
@@ -185,3 +293,10 @@ def _evaluation_function(state):
 
     return reward
 
+
+def _player_evaluation_function(state):
+    """
+    Evaluates how good the terminal position is for the player, for
+    when the computer is playing the player's side.
+    """
+    return 1.0 - _evaluation_function(state)
@@ -0,0 +1,139 @@
+"""
+This module holds heuristics for Connect 4 that can be plugged into the
+search through its SearchOptions.
+"""
+from games.connect4.board import COL_STRIDE, DIRECTIONS, NUM_COLS, NUM_ROWS,\
+        has_four
+import math
+import random
+
+_CENTER_COL = NUM_COLS // 2
+
+# The bitboard with a bit set for the bottom spot of each column, and the
+# one with a bit set for every spot (leaving out the sentinel bits)
+_BOTTOM_MASK = sum(1 << (c * COL_STRIDE) for c in range(NUM_COLS))
+_BOARD_MASK = _BOTTOM_MASK * ((1 << NUM_ROWS) - 1)
+
+# How far count_threats moves its estimate toward one player for each
+# threat more than the other has, on the logistic scale
+_THREAT_WEIGHT = 0.6
+
+# How much more likely center_weighted is to pick each column than it
+# would be if it picked uniformly: one more for each step nearer the
+# center, since a disc nearer the center is part of more lines of four
+_CENTER_WEIGHTS = tuple(_CENTER_COL + 1 - abs(c - _CENTER_COL)
+                        for c in range(NUM_COLS))
+
+# How much weight center_prior adds to a move that wins, or that stops
+# the other player from winning, on top of its center weight
+_URGENT_WEIGHT = 4 * sum(_CENTER_WEIGHTS)
+
+
+def center_first(state, moves):
+    """
+    A move_ordering that tries the columns nearest the center first,
+    since a disc there is part of the most possible lines of four.
+    """
+    return sorted(moves, key=lambda c: abs(c - _CENTER_COL))
+
+
+def center_prior(state, moves):
+    """
+    A prior_function that gives each column a prior in proportion to how
+    near it is to the center, except that a column that wins right away
+    or blocks the other player's win gets nearly all of it.
+    """
+    weights = [_CENTER_WEIGHTS[c] for c in moves]
+    urgent = _winning_or_blocking_move(state, moves)
+    if urgent is not None:
+        weights[moves.index(urgent)] += _URGENT_WEIGHT
+    total = sum(weights)
+    return [w / total for w in weights]
+
+
+def center_weighted(state, moves):
+    """
+    A rollout_policy that picks a random column, with the columns nearer
+    the center more likely to be picked.
+    """
+    return random.choices(moves, [_CENTER_WEIGHTS[c] for c in moves])[0]
+
+
+def count_threats(state, reward_function):
+    """
+    A static_evaluator that scores a game that isn't over by who has the
+    most threats: empty spots that would give them four in a row. If the
+    player to move can win right away, it is scored as won. Otherwise,
+    each threat one player has more than the other makes them a bit more
+    likely to be the winner.
+    """
+    x_mask, o_mask, _ = state._board.as_bitboards()
+    both = x_mask | o_mask
+    empty = _BOARD_MASK & ~both
+    # Adding a bit at the bottom of each column carries up past its
+    # discs to the spot where the next disc in it would go
+    playable = (both + _BOTTOM_MASK) & _BOARD_MASK
+    x_threats = _winning_spots(x_mask) & empty
+    o_threats = _winning_spots(o_mask) & empty
+
+    mover = state.current_player_symbol()
+    if (x_threats if mover == 'x' else o_threats) & playable:
+        return state.reward_for_winner(reward_function, mover)
+    advantage = bin(x_threats).count("1") - bin(o_threats).count("1")
+    x_chance = 1 / (1 + math.exp(-_THREAT_WEIGHT * advantage))
+    return x_chance * state.reward_for_winner(reward_function, 'x') +\
+            (1 - x_chance) * state.reward_for_winner(reward_function, 'o')
+
+
+def win_then_block(state, moves):
+    """
+    A rollout_policy that takes a win if there is one, and otherwise
+    blocks the other player's win if they have one. If there is neither,
+    it picks a column like center_weighted does. This makes rollouts
+    play out much more like real games do, for a few bitboard checks a
+    move.
+    """
+    move = _winning_or_blocking_move(state, moves)
+    if move is None:
+        return center_weighted(state, moves)
+    return move
+
+
+def _winning_or_blocking_move(state, moves):
+    """
+    Returns the first of moves that wins right away, or if there isn't
+    one, the first that blocks the other player from winning right away.
+    Returns None if there is neither.
+    """
+    x_mask, o_mask, heights = state._board.as_bitboards()
+    if state.current_player_symbol() == 'x':
+        mine, theirs = x_mask, o_mask
+    else:
+        mine, theirs = o_mask, x_mask
+    bits = [1 << (c * COL_STRIDE + heights[c]) for c in moves]
+    for move, bit in zip(moves, bits):
+        if has_four(mine | bit):
+            return move
+    for move, bit in zip(moves, bits):
+        if has_four(theirs | bit):
+            return move
+    return None
+
+
+def _winning_spots(mask):
+    """
+    Returns a bitboard of the spots that would complete four in a row
+    with the discs in the given bitboard, filled or not, and possibly
+    with stray bits outside of the board.
+    """
+    spots = 0
+    for shift in DIRECTIONS:
+        # The spot is at one end of three in a row...
+        pairs = (mask << shift) & (mask << 2 * shift)
+        spots |= pairs & (mask << 3 * shift)
+        # ...or in a gap, with two on one side and one on the other
+        spots |= pairs & (mask >> shift)
+        pairs = (mask >> shift) & (mask >> 2 * shift)
+        spots |= pairs & (mask << shift)
+        spots |= pairs & (mask >> 3 * shift)
+    return spots
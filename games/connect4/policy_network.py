@@ -0,0 +1,146 @@
+"""
+This module holds a learned rollout policy for Connect 4: a linear
+model or a small multilayer perceptron, run with NumPy, that scores
+each column from where the discs are.
+
+To use it, load a PolicyNetwork from a weights file with load, then pass
+its batch_rollouts as the rollout_backend of the SearchOptions given to
+the UCT search, along with a rollouts_per_leaf in the hundreds. That
+plays the rollouts all at once, so the network is run on a whole batch
+of boards per move. The network itself can also be passed as the
+rollout_policy, but running it one board at a time is slow. Its priors
+can be passed as the prior_function, to search with PUCT.
+"""
+from games.connect4.board import COL_STRIDE, NUM_COLS, NUM_ROWS
+from games.connect4.rollouts import play_out
+import math
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The number of inputs to the network: one for each spot for the discs
+# of the player to move, then one for each spot for the other player's
+NUM_INPUTS = 2 * NUM_ROWS * NUM_COLS
+
+# The bitboard bit of each spot, in the order the network sees them
+_SPOT_BITS = tuple(col * COL_STRIDE + row
+                   for col in range(NUM_COLS) for row in range(NUM_ROWS))
+
+
+class PolicyNetwork:
+    """
+    This class holds the layers of the network, as a list of (weights,
+    biases) pairs. The first layer's weights have NUM_INPUTS rows and
+    the last layer's have NUM_COLS columns, one score for each column.
+    Every layer but the last is followed by a ReLU, so one layer is a
+    linear policy. Columns are picked with probabilities given by the
+    softmax of their scores.
+    """
+    def __init__(self, layers):
+        if np is None:
+            raise ImportError("A PolicyNetwork needs NumPy to be installed")
+        if len(layers) == 0:
+            raise ValueError("A PolicyNetwork needs at least one layer")
+        self.layers = [(np.asarray(w, dtype=np.float64),
+                        np.asarray(b, dtype=np.float64)) for w, b in layers]
+        num_inputs = NUM_INPUTS
+        for w, b in self.layers:
+            if w.ndim != 2 or w.shape[0] != num_inputs or\
+                    b.shape != (w.shape[1],):
+                raise ValueError("The layers' shapes don't fit together")
+            num_inputs = w.shape[1]
+        if num_inputs != NUM_COLS:
+            raise ValueError("The last layer must have one output for "
+                             "each column")
+        self._spot_bits = np.array(_SPOT_BITS, dtype=np.uint64)
+
+    def __call__(self, state, moves):
+        """
+        A rollout_policy that picks one of moves for the given state.
+        """
+        return random.choices(moves, self.priors(state, moves))[0]
+
+    def batch_rollouts(self, state, reward_function, num_rollouts):
+        """
+        A rollout_backend that plays num_rollouts games out from the
+        given state with the network picking every move, and returns
+        the total of their rewards according to reward_function.
+        """
+        return play_out(state, reward_function, num_rollouts,
+                        self._choose_columns)
+
+    def priors(self, state, moves):
+        """
+        A prior_function that gives each of moves its probability under
+        the softmax of the network's scores for the given state.
+        """
+        x_mask, o_mask, _ = state._board.as_bitboards()
+        if state.current_player_symbol() == 'x':
+            mine, theirs = x_mask, o_mask
+        else:
+            mine, theirs = o_mask, x_mask
+        scores = self.scores(np.array([mine], dtype=np.uint64),
+                             np.array([theirs], dtype=np.uint64))[0]
+        best = max(scores[c] for c in moves)
+        weights = [math.exp(scores[c] - best) for c in moves]
+        total = sum(weights)
+        return [w / total for w in weights]
+
+    def save(self, path):
+        """
+        Writes the layers to the given .npz file, in the form load reads.
+        """
+        arrays = {}
+        for i, (w, b) in enumerate(self.layers):
+            arrays["w" + str(i)] = w
+            arrays["b" + str(i)] = b
+        np.savez(path, **arrays)
+
+    def scores(self, mine, theirs):
+        """
+        Returns an array with a row of column scores for each pair of
+        bitboards in mine (the player to move's) and theirs.
+        """
+        x = np.concatenate((self._spots(mine), self._spots(theirs)), axis=1)
+        for w, b in self.layers[:-1]:
+            x = np.maximum(x @ w + b, 0)
+        w, b = self.layers[-1]
+        return x @ w + b
+
+    def _choose_columns(self, rng, mine, theirs, legal):
+        """
+        Samples a legal column for each game from the softmax of the
+        network's scores.
+        """
+        # Adding Gumbel noise to the scores and taking the largest samples
+        # from their softmax, without having to work out the softmax
+        scores = self.scores(mine, theirs) + rng.gumbel(size=legal.shape)
+        return np.where(legal, scores, -np.inf).argmax(axis=1)
+
+    def _spots(self, masks):
+        """
+        Unpacks each of the given bitboards into a row of 0s and 1s, one
+        for each spot.
+        """
+        bits = (masks[:, np.newaxis] >> self._spot_bits) & np.uint64(1)
+        return bits.astype(np.float64)
+
+
+def load(path):
+    """
+    Reads a PolicyNetwork from the given .npz file, which holds the
+    weights and biases of layer i as the arrays wi and bi.
+    """
+    if np is None:
+        raise ImportError("A PolicyNetwork needs NumPy to be installed")
+    with np.load(path) as arrays:
+        num_layers = len(arrays.files) // 2
+        try:
+            layers = [(arrays["w" + str(i)], arrays["b" + str(i)])
+                      for i in range(num_layers)]
+        except KeyError:
+            raise ValueError(path + " isn't a PolicyNetwork weights file")
+    return PolicyNetwork(layers)
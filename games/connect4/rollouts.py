@@ -0,0 +1,111 @@
+"""
+This module holds a NumPy rollout engine for Connect 4, which plays out
+a whole batch of random games at once as arrays of bitboards.
+
+To use it, pass batch_rollouts as the rollout_backend of the
+SearchOptions given to the UCT search, along with a rollouts_per_leaf
+in the hundreds or thousands.
+"""
+from games.connect4.board import COL_STRIDE, DIRECTIONS, NUM_COLS, NUM_ROWS
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def batch_rollouts(state, reward_function, num_rollouts):
+    """
+    Plays num_rollouts games out from the given state by picking uniformly
+    random legal moves, and returns the total of their rewards according
+    to reward_function. The state itself is not changed.
+    """
+    return play_out(state, reward_function, num_rollouts, _random_columns)
+
+
+def play_out(state, reward_function, num_rollouts, choose_columns):
+    """
+    Plays num_rollouts games out from the given state all at once, and
+    returns the total of their rewards according to reward_function. The
+    state itself is not changed.
+
+    choose_columns picks the next move of every game still going. It is
+    called as choose_columns(rng, mine, theirs, legal), where mine and
+    theirs are arrays of the bitboards of the player to move and of the
+    other player in each game, and legal is a boolean array with a row
+    for each game saying which columns aren't full. It returns an array
+    of the columns to play.
+    """
+    if np is None:
+        raise ImportError("Batch rollouts need NumPy to be installed")
+    if state.game_over():
+        return num_rollouts * reward_function(state)
+
+    # Seed from the random module, so that seeded searches still
+    # reproduce exactly
+    rng = np.random.default_rng(random.getrandbits(64))
+    x_mask, o_mask, start_heights = state._board.as_bitboards()
+    num_discs = sum(start_heights)
+
+    # masks[0] are the x bitboards of each game, masks[1] the o ones
+    masks = np.empty((2, num_rollouts), dtype=np.uint64)
+    masks[0] = x_mask
+    masks[1] = o_mask
+    heights = np.tile(np.array(start_heights, dtype=np.int64),
+                      (num_rollouts, 1))
+    # Which of masks the winner of each game is in, or -1 for no winner
+    winners = np.full(num_rollouts, -1, dtype=np.int8)
+    mover = 0 if state.current_player_symbol() == 'x' else 1
+
+    # All of the games still going have the same number of discs in
+    # them, so they all run out of moves at the same time.
+    games = np.arange(num_rollouts)
+    while len(games) > 0 and num_discs < NUM_ROWS * NUM_COLS:
+        legal = heights[games] < NUM_ROWS
+        columns = choose_columns(rng, masks[mover, games],
+                                 masks[1 - mover, games], legal)
+        rows = heights[games, columns]
+        heights[games, columns] = rows + 1
+        bits = np.left_shift(np.uint64(1),
+                             (columns * COL_STRIDE + rows).astype(np.uint64))
+        moved = masks[mover, games] | bits
+        masks[mover, games] = moved
+
+        won = _has_four(moved)
+        winners[games[won]] = mover
+        games = games[~won]
+        mover = 1 - mover
+        num_discs += 1
+
+    num_x_wins = int(np.count_nonzero(winners == 0))
+    num_o_wins = int(np.count_nonzero(winners == 1))
+    num_draws = num_rollouts - num_x_wins - num_o_wins
+    total_reward = 0
+    for winner, count in (('x', num_x_wins), ('o', num_o_wins),
+                          (' ', num_draws)):
+        if count:
+            total_reward += count * state.reward_for_winner(reward_function,
+                                                            winner)
+    return total_reward
+
+
+def _has_four(masks):
+    """
+    Returns an array saying whether each of the given bitboards contains
+    four set bits in a row along any of the line directions.
+    """
+    won = np.zeros(masks.shape, dtype=bool)
+    for shift in DIRECTIONS:
+        pairs = masks & (masks >> np.uint64(shift))
+        won |= (pairs & (pairs >> np.uint64(2 * shift))) != 0
+    return won
+
+
+def _random_columns(rng, mine, theirs, legal):
+    """
+    Picks a uniformly random legal column for each game.
+    """
+    # Adding 1 to each legal column's random number means that the
+    # largest one is always a uniformly random legal column.
+    return (rng.random(legal.shape) + legal).argmax(axis=1)
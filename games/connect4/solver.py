@@ -0,0 +1,111 @@
+"""
+This module holds an endgame solver for Connect 4, which works out who
+wins positions with only a few empty spots left by negamax search with
+alpha-beta pruning and a transposition table.
+
+To use it, pass solve as the solver of the SearchOptions given to the
+UCT search.
+"""
+from games.connect4.board import COL_STRIDE, NUM_COLS, NUM_ROWS, has_four
+
+# Positions with more empty spots than this are not solved, since the
+# search would take too long
+max_empty_spots = 12
+
+# The most positions to keep in the transposition table before starting
+# it over
+_MAX_TABLE_SIZE = 1000000
+
+# Which bound a value in the transposition table is
+_EXACT = 0
+_LOWER = 1
+_UPPER = 2
+
+# Columns nearest the center first, since those moves are most often
+# the best ones, and trying the best moves first prunes the most
+_COLUMN_ORDER = sorted(range(NUM_COLS), key=lambda c: abs(c - NUM_COLS // 2))
+
+# The bits of one column of a bitboard, not counting the sentinel bit
+_COLUMN_MASK = (1 << NUM_ROWS) - 1
+
+# Maps (bitboard of the player to move, bitboard of the other player) to
+# (value, bound), where the value is for the player to move
+_table = {}
+
+
+def solve(state):
+    """
+    Returns who wins the game from the given state if both sides play
+    perfectly: the winner's symbol, or ' ' for a draw. Returns None if
+    there are more than max_empty_spots empty spots left.
+    """
+    if state.game_over():
+        return state.get_winner()
+    x_mask, o_mask, _ = state._board.as_bitboards()
+    num_empty = NUM_ROWS * NUM_COLS - bin(x_mask | o_mask).count("1")
+    if num_empty > max_empty_spots:
+        return None
+
+    if len(_table) > _MAX_TABLE_SIZE:
+        _table.clear()
+    mover = state.current_player_symbol()
+    if mover == 'x':
+        value = _negamax(x_mask, o_mask, num_empty, -1, 1)
+    else:
+        value = _negamax(o_mask, x_mask, num_empty, -1, 1)
+    if value == 0:
+        return ' '
+    elif value == 1:
+        return mover
+    else:
+        return 'o' if mover == 'x' else 'x'
+
+
+def _negamax(mine, theirs, num_empty, alpha, beta):
+    """
+    Returns the value of the position where the player to move has the
+    discs in mine and the other player has the discs in theirs: 1 if
+    the player to move wins with perfect play, 0 if it is a draw and -1
+    if they lose. Only values between alpha and beta are exact; a value
+    at or below alpha means it is at most that, and one at or above
+    beta means it is at least that.
+    """
+    key = (mine, theirs)
+    entry = _table.get(key)
+    if entry is not None:
+        value, bound = entry
+        if bound == _EXACT or\
+                (bound == _LOWER and value >= beta) or\
+                (bound == _UPPER and value <= alpha):
+            return value
+    if num_empty == 0:
+        return 0
+
+    original_alpha = alpha
+    both = mine | theirs
+    best = -1
+    for col in _COLUMN_ORDER:
+        height = ((both >> (col * COL_STRIDE)) & _COLUMN_MASK).bit_length()
+        if height == NUM_ROWS:
+            continue
+        bit = 1 << (col * COL_STRIDE + height)
+        if has_four(mine | bit):
+            value = 1
+        else:
+            value = -_negamax(theirs, mine | bit, num_empty - 1,
+                              -beta, -alpha)
+        if value > best:
+            best = value
+            if best > alpha:
+                alpha = best
+                if alpha >= beta:
+                    break
+
+    if best <= original_alpha:
+        bound = _UPPER
+    elif best >= beta:
+        bound = _LOWER
+    else:
+        bound = _EXACT
+    _table[key] = (best, bound)
+    return best
@@ -2,31 +2,66 @@
 This module holds the TicTacToe game's Board class.
 """
 import os
+import random
+
+# The number of spots on the board. Spot (row, col) is bit 3 * row + col
+# of a bitboard.
+NUM_SPOTS = 9
+
+# Every row, column and diagonal, as bitboards
+LINES = (0b000000111, 0b000111000, 0b111000000,
+         0b001001001, 0b010010010, 0b100100100,
+         0b100010001, 0b001010100)
+
+# Random 64 bit keys for Zobrist hashing, one per symbol per spot. They
+# come from a fixed seed so that every process agrees on them.
+_zobrist_rng = random.Random(0x77)
+_ZOBRIST_KEYS = {
+    symbol: [_zobrist_rng.getrandbits(64) for _ in range(NUM_SPOTS)]
+    for symbol in ('x', 'o')
+}
+
+# Says, for each of the 512 possible bitboards, whether it has three in
+# a row, so checking for a win is a single lookup.
+IS_WIN = tuple(any(mask & line == line for line in LINES)
+               for mask in range(1 << NUM_SPOTS))
+
+# Maps a mask with a bit set for each empty spot to the tuple of those
+# spots, so the legal moves never have to be built.
+_MOVES_FOR_MASK = tuple(
+    tuple((i // 3, i % 3) for i in range(NUM_SPOTS) if mask & (1 << i))
+    for mask in range(1 << NUM_SPOTS)
+)
+
+# The bitboard with every spot set
+FULL_MASK = (1 << NUM_SPOTS) - 1
+
 
 class Board:
     """
     This class represents the game's board.
+
+    The board is stored as a pair of 9 bit bitboards, one for each
+    symbol. Bit (3 * row + col) of a bitboard is set if that symbol is
+    at that spot.
     """
     def __init__(self):
-        top =    [" ", " ", " "]
-        middle = [" ", " ", " "]
-        bottom = [" ", " ", " "]
-        self._rows = [top, middle, bottom]
+        self._x_mask = 0
+        self._o_mask = 0
+        self._hash = 0
+        self._num_placed = 0
+        self._winner = None
+        self._num_placed_at_win = None
 
     def __str__(self):
-        s = os.linesep
-        s += " " * 3 + self._rows[0][0] + " | " + self._rows[0][1] + " | "+\
-                self._rows[0][2]
-        s += os.linesep
-        s += "-----" * 3
-        s += os.linesep
-        s += " " * 3 + self._rows[1][0] + " | " + self._rows[1][1] + " | "+\
-                self._rows[1][2]
-        s += os.linesep
-        s += "-----" * 3
-        s += os.linesep
-        s += " " * 3 + self._rows[2][0] + " | " + self._rows[2][1] + " | "+\
-                self._rows[2][2]
+        s = ""
+        for r in range(3):
+            s += os.linesep
+            s += " " * 3 + " | ".join(self._symbol_at(r, c)
+                                      for c in range(3))
+            if r != 2:
+                s += os.linesep
+                s += "-----" * 3
         return s
 
     def place(self, move, symbol):
@@ -37,73 +72,87 @@ class Board:
         assert(self.valid_move(move))
 
         r, c = move
-        self._rows[r][c] = symbol
+        index = 3 * r + c
+        self._hash ^= _ZOBRIST_KEYS[symbol][index]
+        self._num_placed += 1
+        if symbol == 'x':
+            self._x_mask |= 1 << index
+            mask = self._x_mask
+        else:
+            self._o_mask |= 1 << index
+            mask = self._o_mask
+
+        # Nobody had three in a row before this symbol went in (or else
+        # we would already have a winner), so a win now is this symbol's.
+        if self._winner is None and IS_WIN[mask]:
+            self._winner = symbol
+            self._num_placed_at_win = self._num_placed
+
+    def as_bitboards(self):
+        """
+        Returns the x bitboard and the o bitboard, for code that works on
+        the bitboards directly.
+        """
+        return self._x_mask, self._o_mask
+
+    def legal_moves(self):
+        """
+        Returns a tuple of the empty spots, as (row, col) tuples in order.
+        This is a lookup on the bitboards, so it is free to call.
+        """
+        return _MOVES_FOR_MASK[FULL_MASK & ~(self._x_mask | self._o_mask)]
 
     def three_in_a_row(self):
         """
         Returns True if x or if o has three in a row.
         Also returns who won if there is a winner (otherwise returns None).
         """
-        rows, winner = self._check_for_three(self._rows)
-        if rows:
-            return True, winner
-        cols, winner = self._check_for_three(self._cols())
-        if cols:
-            return True, winner
-        diagonals, winner = self._check_for_three(self._diagonals())
-        if diagonals:
-            return True, winner
+        if self._winner is None:
+            return False, None
+        return True, self._winner
 
-        return False, None
+    def undo(self, move):
+        """
+        Clears the given location on the board.
+        """
+        r, c = move
+        index = 3 * r + c
+        bit = 1 << index
+        assert((self._x_mask | self._o_mask) & bit)
+        symbol = 'x' if self._x_mask & bit else 'o'
+        self._hash ^= _ZOBRIST_KEYS[symbol][index]
+        self._x_mask &= ~bit
+        self._o_mask &= ~bit
+        if self._winner is not None and\
+                self._num_placed == self._num_placed_at_win:
+            self._winner = None
+            self._num_placed_at_win = None
+        self._num_placed -= 1
 
     def valid_move(self, move):
         """
         Checks the given row, col tuple for validity in the game board.
         """
         r, c = move
-        try:
-            spot = self._rows[r][c]
-            return spot == ' '
-        except IndexError:
+        if not (0 <= r < 3 and 0 <= c < 3):
             return False
+        return not (self._x_mask | self._o_mask) & (1 << (3 * r + c))
 
-    def _check_for_three(self, ls):
-        for row_col_or_diag in ls:
-            s = 0
-            for spot in row_col_or_diag:
-                s += self._evaluate(spot)
-            if s is 3:
-                return True, 'x'
-            elif s is -3:
-                return True, 'o'
-        return False, ' '
-
-    def _cols(self):
+    def zobrist_hash(self):
         """
-        Returns a generator that generates each column.
+        Returns a 64 bit hash of where the symbols are. It is kept up to
+        date as symbols are placed and removed, so this is free to call.
         """
-        yield [row[0] for row in self._rows]
-        yield [row[1] for row in self._rows]
-        yield [row[2] for row in self._rows]
+        return self._hash
 
-    def _diagonals(self):
+    def _symbol_at(self, r, c):
         """
-        Returns a generator that generates each diagonal.
+        Returns the symbol at the given spot, or ' ' if it is empty.
         """
-        yield [self._rows[0][0], self._rows[1][1], self._rows[2][2]]
-        yield [self._rows[0][2], self._rows[1][1], self._rows[2][0]]
-
-    def _evaluate(self, spot):
-        """
-        Evaluates a spot, giving a 1 if it is an 'x', a -1 if it is an 'o'
-        and a 0 if it is neither.
-        """
-        if spot == 'x':
-            return 1
-        elif spot == 'o':
-            return -1
+        bit = 1 << (3 * r + c)
+        if self._x_mask & bit:
+            return 'x'
+        elif self._o_mask & bit:
+            return 'o'
         else:
-            return 0
-
-
-
+            return ' '
@@ -0,0 +1,62 @@
+"""
+This module holds a perfect-play solver for Tic Tac Toe, which looks
+positions up in a tablebase of every position's value.
+
+To use it, pass solve as the solver of the SearchOptions given to the
+UCT search.
+"""
+from games.tictactoe.board import FULL_MASK, IS_WIN, NUM_SPOTS
+
+# Maps (bitboard of the player to move, bitboard of the other player) to
+# 1 if the player to move wins with perfect play, 0 if it is a draw and
+# -1 if they lose. It is filled in all at once, the first time it is
+# needed. There are only a few thousand positions, so it is quick.
+_tablebase = {}
+
+
+def solve(state):
+    """
+    Returns who wins the game from the given state if both sides play
+    perfectly: the winner's symbol, or ' ' for a draw.
+    """
+    if state.game_over():
+        return state.get_winner()
+    if not _tablebase:
+        _value(0, 0)
+
+    x_mask, o_mask = state._board.as_bitboards()
+    mover = state.current_player_symbol()
+    if mover == 'x':
+        value = _tablebase[(x_mask, o_mask)]
+    else:
+        value = _tablebase[(o_mask, x_mask)]
+    if value == 0:
+        return ' '
+    elif value == 1:
+        return mover
+    else:
+        return 'o' if mover == 'x' else 'x'
+
+
+def _value(mine, theirs):
+    """
+    Works out the value of the position where the player to move has
+    the spots in mine and the other player has the spots in theirs, for
+    the player to move, along with every position reachable from it.
+    """
+    key = (mine, theirs)
+    if key in _tablebase:
+        return _tablebase[key]
+    empty = FULL_MASK & ~(mine | theirs)
+    if IS_WIN[theirs]:
+        best = -1
+    elif not empty:
+        best = 0
+    else:
+        best = -1
+        for i in range(NUM_SPOTS):
+            bit = 1 << i
+            if empty & bit:
+                best = max(best, -_value(theirs, mine | bit))
+    _tablebase[key] = best
+    return best
@@ -17,6 +17,7 @@ class ImproperUsageError(Exception):
 # Global variables
 _metadata = MetaData()
 _gamestate = None
+_ponder = None
 
 
 def game_over():
@@ -26,6 +27,13 @@ def game_over():
     return _gamestate.game_over()
 
 
+def get_ai_symbol():
+    """
+    Returns the symbol that the computer is playing as.
+    """
+    return _metadata.ai_symbol
+
+
 def get_ending_msg():
     """
     Returns the ending message (such as who won).
@@ -65,6 +73,14 @@ def get_next_metadata_request_str():
     return _metadata.get_next_request_str()
 
 
+def get_winner():
+    """
+    Returns the winner's symbol once the game is over, or ' ' if it
+    was a draw.
+    """
+    return _gamestate.get_winner()
+
+
 def info_not_valid(info):
     """
     Returns True if the given info is NOT valid for the game state's
@@ -109,6 +125,13 @@ def needs_more_player_input():
     return _gamestate.needs_more_player_input()
 
 
+def possible_moves():
+    """
+    Returns the moves that whoever's turn it is could take.
+    """
+    return _gamestate.possible_moves()
+
+
 def players_turn():
     """
     Returns True if it is the player's turn, False if it is the
@@ -131,6 +154,28 @@ def set_next_metadata(d):
     _metadata.set_next_metadata(d)
 
 
+def start_pondering():
+    """
+    Lets the computer think about its next move while the player is
+    thinking about theirs. stop_pondering() must be called before the
+    player's turn is taken.
+    """
+    global _ponder
+    if _ponder is None:
+        _ponder = _gamestate.start_pondering()
+
+
+def stop_pondering():
+    """
+    Stops the computer thinking in the background, keeping what it
+    worked out for its next turn.
+    """
+    global _ponder
+    if _ponder is not None:
+        _ponder.stop()
+        _ponder = None
+
+
 def take_ai_turn():
     """
     Modifies the game state so that the computer has taken its turn.
@@ -138,6 +183,15 @@ def take_ai_turn():
     _gamestate.take_ai_turn()
 
 
+def take_ai_player_turn():
+    """
+    Modifies the game state so that the computer has taken the player's
+    turn for them, playing to win for the player's side. This is for
+    pitting the computer against itself.
+    """
+    _gamestate.take_ai_player_turn()
+
+
 def take_player_turn():
     """
     Modifies the game state so that the player has taken his/her turn.
@@ -145,6 +199,14 @@ def take_player_turn():
     _gamestate.take_player_turn()
 
 
+def take_turn(move):
+    """
+    Modifies the game state so that whoever's turn it is has taken the
+    given move, which must be one of possible_moves().
+    """
+    _gamestate.take_turn(move)
+
+
 def welcome_string():
     """
     Returns the welcome string
@@ -43,14 +43,23 @@ def start_game():
 
 
 def _do_players_turn():
-    while game_module.needs_more_player_input():
-        info = _get_next_input()
-        invalid_move, err_msg = game_module.info_not_valid(info)
-        while invalid_move:
-            print(err_msg)
+    # Games that can have the computer think during the player's turn
+    # provide start_pondering and stop_pondering
+    pondering = hasattr(game_module, "start_pondering")
+    if pondering:
+        game_module.start_pondering()
+    try:
+        while game_module.needs_more_player_input():
             info = _get_next_input()
             invalid_move, err_msg = game_module.info_not_valid(info)
-        game_module.set_next_input(info)
+            while invalid_move:
+                print(err_msg)
+                info = _get_next_input()
+                invalid_move, err_msg = game_module.info_not_valid(info)
+            game_module.set_next_input(info)
+    finally:
+        if pondering:
+            game_module.stop_pondering()
     game_module.take_player_turn()
 
 def _get_next_metadata():